@@ -6,6 +6,8 @@ This is the integrated version that replaces the original app.py
 
 import os
 import sys
+import logging
+import importlib
 from flask import Flask
 from flask_cors import CORS
 from dotenv import load_dotenv
@@ -13,112 +15,247 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
+# Configure logging before anything below reports its status
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(process)d %(levelname)s %(name)s: %(message)s')
+logger = logging.getLogger(__name__)
+
 # Add the current directory to Python path for imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# Import existing AI categorization logic
-try:
-    from ml_model.ultra_perfect_categorizer import UltraPerfectExpenseCategorizer
-    USING_ULTRA_PERFECT_MODEL = True
-    USING_PERFECT_MODEL = False
-    USING_IMPROVED_MODEL = False
-    print("🚀 Using ULTRA-PERFECT high-confidence categorizer")
-except ImportError:
+# AI categorizer backends in order of preference:
+# (name, module, class, takes model_path, scores the merchant name)
+BACKENDS = [
+    ('ultra-perfect', 'ml_model.ultra_perfect_categorizer', 'UltraPerfectExpenseCategorizer', False, False),
+    ('perfect', 'ml_model.perfect_categorizer', 'PerfectExpenseCategorizer', False, False),
+    ('improved', 'ml_model.improved_transformer_categorizer', 'ImprovedTransformerCategorizer', True, False),
+    ('original', 'ml_model.transformer_categorizer', 'TransformerCategorizer', True, True),
+]
+
+# Resolve the first importable backend once; init_ai_categorizer may still
+# switch BACKEND to 'onnx-int8' when an exported ONNX model is present
+Categorizer = None
+CATEGORIZER_TAKES_MODEL_PATH = False
+CATEGORIZER_USES_MERCHANT = False
+BACKEND = None
+for _name, _module, _class, _takes_model_path, _uses_merchant in BACKENDS:
     try:
-        from ml_model.perfect_categorizer import PerfectExpenseCategorizer
-        USING_ULTRA_PERFECT_MODEL = False
-        USING_PERFECT_MODEL = True
-        USING_IMPROVED_MODEL = False
-        print("🎯 Using perfect high-confidence categorizer")
+        Categorizer = getattr(importlib.import_module(_module), _class)
     except ImportError:
-        try:
-            from ml_model.improved_transformer_categorizer import ImprovedTransformerCategorizer
-            USING_ULTRA_PERFECT_MODEL = False
-            USING_PERFECT_MODEL = False
-            USING_IMPROVED_MODEL = True
-            print("🚀 Using improved transformer categorizer")
-        except ImportError:
-            try:
-                from ml_model.transformer_categorizer import TransformerCategorizer
-                USING_ULTRA_PERFECT_MODEL = False
-                USING_PERFECT_MODEL = False
-                USING_IMPROVED_MODEL = False
-                print("⚠️  Using original transformer categorizer")
-            except ImportError:
-                print("❌ No AI categorization models found")
-                USING_ULTRA_PERFECT_MODEL = False
-                USING_PERFECT_MODEL = False
-                USING_IMPROVED_MODEL = False
+        continue
+    BACKEND = _name
+    CATEGORIZER_TAKES_MODEL_PATH = _takes_model_path
+    CATEGORIZER_USES_MERCHANT = _uses_merchant
+    logger.info(f"🚀 Using {_name} categorizer ({_class})")
+    break
+else:
+    logger.error("❌ No AI categorization models found")
+
+from services.micro_batcher import MicroBatcher
+from model_server import ModelServerClient
+from services.correction_log import CorrectionLog
+from services.schemas import (
+    CategorizeRequest, CategorizeBatchRequest, CorrectionRequest, SaveExpenseRequest, decode_request
+)
 
 # Import receipt scanning services
 try:
     from services.receipt_extractor import GeminiReceiptExtractor
     from services.firestore_service import FirestoreService
     RECEIPT_SCANNING_AVAILABLE = True
-    print("✅ Receipt scanning services loaded")
+    logger.info("✅ Receipt scanning services loaded")
 except ImportError as e:
-    print(f"⚠️ Receipt scanning services not available: {str(e)}")
+    logger.warning(f"⚠️ Receipt scanning services not available: {str(e)}")
     RECEIPT_SCANNING_AVAILABLE = False
 
-import csv
 import io
-import uuid
+import time
+import itertools
 import mimetypes
-import logging
+import secrets
+import threading
 from datetime import datetime
-from flask import request, jsonify
+from typing import Any, Dict
+import msgspec
+from cachetools import LRUCache, TTLCache
+from flask import request, jsonify, send_from_directory
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import generate_etag
 from werkzeug.utils import secure_filename
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+# Optional fast JSON encoder for jsonify
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 # Create Flask app
 app = Flask(__name__)
 CORS(app)
 
+if ORJSON_AVAILABLE:
+    class OrjsonProvider(DefaultJSONProvider):
+        """Flask JSON provider that encodes/decodes with orjson"""
+        # Dates still go through Flask's default() so their format is unchanged
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj, default=self.default, option=self.option).decode('utf-8')
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+        def response(self, *args, **kwargs):
+            obj = self._prepare_response_obj(args, kwargs)
+            return self._app.response_class(
+                orjson.dumps(obj, default=self.default, option=self.option),
+                mimetype=self.mimetype
+            )
+
+    app.json = OrjsonProvider(app)
+
 # Configuration
 MODEL_PATH = os.environ.get('MODEL_PATH', 'models/expense_distilbert')
+ONNX_MODEL_PATH = os.environ.get('ONNX_MODEL_PATH', 'models/expense_distilbert_onnx/model_int8.onnx')
 PORT = int(os.environ.get('PORT', 8001))
 HOST = os.environ.get('HOST', '0.0.0.0')
 DEBUG = os.environ.get('DEBUG', 'False').lower() == 'true'
 
+# Micro-batching of concurrent /api/categorize calls (on by default for the ONNX model)
+MICRO_BATCH_ENABLED = os.environ.get('CATEGORIZE_MICRO_BATCH', '').lower() == 'true'
+MICRO_BATCH_MAX_SIZE = int(os.environ.get('CATEGORIZE_MAX_BATCH', 32))
+MICRO_BATCH_MAX_WAIT = float(os.environ.get('CATEGORIZE_MAX_WAIT_MS', 5)) / 1000.0
+
+# Shared model server socket (see model_server.py); workers forward ONNX inference to it
+MODEL_SERVER_SOCKET = os.environ.get('MODEL_SERVER_SOCKET')
+
+# Cache of /api/categorize results keyed by (normalized description, amount)
+CATEGORIZE_CACHE_SIZE = int(os.environ.get('CATEGORIZE_CACHE_SIZE', 50_000))
+
+# Seconds a per-user Firestore read (expenses list / summary) is served from memory
+USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 30))
+
 # File upload configuration
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp', 'heic', 'heif'}
+EXT_TO_FMT = {
+    'jpg': 'jpeg',
+    'jpeg': 'jpeg',
+    'png': 'png',
+    'gif': 'gif',
+    'bmp': 'bmp',
+    'webp': 'webp',
+    'heic': 'heic',
+    'heif': 'heif'
+}
+ALLOWED_EXTENSIONS = frozenset(EXT_TO_FMT)
+
+# Let Werkzeug reject oversized uploads before they are buffered
+app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
+
+# Optional local copy of uploaded receipts, served by /api/receipt-file/<filename>
+# (absolute, so writes and send_from_directory don't resolve it against
+# different bases: the working directory vs app.root_path)
+RECEIPTS_DIR = os.environ.get('RECEIPTS_DIR')
+if RECEIPTS_DIR:
+    RECEIPTS_DIR = os.path.abspath(RECEIPTS_DIR)
+    os.makedirs(RECEIPTS_DIR, exist_ok=True)
+
+# Behind nginx, let it serve receipt files directly (X-Sendfile)
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', 'False').lower() == 'true'
 
 # Initialize services
 categorizer = None
+categorize_batcher = None
+categorize_cache = LRUCache(maxsize=CATEGORIZE_CACHE_SIZE)
+categorize_cache_lock = threading.Lock()
+correction_log = None
+
+# Encoded /api/expenses and /api/user-summary bodies: (kind, user_id, ...) -> (etag, body).
+# Writes through this process invalidate the user's entries; other workers
+# may serve a stale body for at most USER_CACHE_TTL seconds.
+user_response_cache = TTLCache(maxsize=10_000, ttl=USER_CACHE_TTL)
+user_response_cache_lock = threading.Lock()
+# Invalidation count per user (None: every user), so a body read before a write
+# isn't cached after that write has invalidated the user's entries
+user_response_generations = {None: 0}
+
+# Firestore connectivity as reported by /api/health, refreshed at most every 5s
+_health_cache = {'ts': 0.0, 'fs': False}
+
+# Category list is fixed once the model is loaded; cached with its /api/categories body
+CATEGORIES = ()
+CATEGORIES_RESPONSE = b''
 gemini_extractor = None
 firestore_service = None
 
+def load_onnx_categorizer():
+    """Load the exported ONNX model if ONNX Runtime is installed"""
+    global categorizer, BACKEND, CATEGORIZER_USES_MERCHANT
+    try:
+        # Imported only when an exported model exists (pulls in transformers)
+        from ml_model.onnx_categorizer import OnnxCategorizer
+    except ImportError:
+        return False
+    categorizer = OnnxCategorizer(model_path=ONNX_MODEL_PATH)
+    BACKEND = 'onnx-int8'
+    CATEGORIZER_USES_MERCHANT = True
+    return True
+
 def init_ai_categorizer():
     """Initialize AI categorization model"""
-    global categorizer
-    print(f"🤖 Loading AI model from: {MODEL_PATH}")
+    global categorizer, categorize_batcher, correction_log, BACKEND, CATEGORIZER_USES_MERCHANT
+    global CATEGORIES, CATEGORIES_RESPONSE
+    logger.info(f"🤖 Loading AI model from: {MODEL_PATH}")
+    
+    # Single buffered writer for user corrections (creates data/ once)
+    correction_log = CorrectionLog('data/corrections.csv', flush_interval=2.0)
+    
     try:
-        if USING_ULTRA_PERFECT_MODEL:
-            categorizer = UltraPerfectExpenseCategorizer()
-        elif USING_PERFECT_MODEL:
-            categorizer = PerfectExpenseCategorizer()
-        elif USING_IMPROVED_MODEL:
-            categorizer = ImprovedTransformerCategorizer(model_path=MODEL_PATH)
+        if MODEL_SERVER_SOCKET and os.path.exists(ONNX_MODEL_PATH):
+            categorizer = ModelServerClient(socket_path=MODEL_SERVER_SOCKET, model_path=ONNX_MODEL_PATH)
+            BACKEND = 'onnx-int8'
+            CATEGORIZER_USES_MERCHANT = True
+            logger.info(f"⚡ Using shared ONNX model server at: {MODEL_SERVER_SOCKET}")
+        elif os.path.exists(ONNX_MODEL_PATH) and load_onnx_categorizer():
+            logger.info(f"⚡ Using ONNX Runtime INT8 categorizer: {ONNX_MODEL_PATH}")
+        elif Categorizer is None:
+            raise ImportError('No AI categorization models found')
+        elif CATEGORIZER_TAKES_MODEL_PATH:
+            categorizer = Categorizer(model_path=MODEL_PATH)
         else:
-            categorizer = TransformerCategorizer(model_path=MODEL_PATH)
+            categorizer = Categorizer()
+        
+        logger.info("✅ AI Model loaded successfully!")
+        
+        # Coalesce concurrent single categorizations into one forward pass
+        # (the model server batches across workers itself)
+        if categorizer and hasattr(categorizer, 'predict_batch') and not isinstance(categorizer, ModelServerClient) \
+                and (BACKEND == 'onnx-int8' or MICRO_BATCH_ENABLED):
+            categorize_batcher = MicroBatcher(
+                categorizer.predict_batch,
+                max_batch=MICRO_BATCH_MAX_SIZE,
+                max_wait=MICRO_BATCH_MAX_WAIT
+            )
+            logger.info(f"📦 Micro-batching enabled (max batch {MICRO_BATCH_MAX_SIZE}, max wait {MICRO_BATCH_MAX_WAIT * 1000:.0f}ms)")
         
-        print(f"✅ AI Model loaded successfully!")
         if categorizer:
-            print(f"📋 Available categories: {', '.join(categorizer.get_categories())}")
+            CATEGORIES = tuple(categorizer.get_categories())
+            CATEGORIES_RESPONSE = app.json.dumps({'categories': CATEGORIES}).encode('utf-8')
+            logger.info(f"📋 Available categories: {', '.join(CATEGORIES)}")
     except Exception as e:
-        print(f"❌ Error loading AI model: {e}")
+        logger.error(f"❌ Error loading AI model: {e}")
         categorizer = None
+        categorize_batcher = None
+        CATEGORIES = ()
+        CATEGORIES_RESPONSE = b''
 
 def init_receipt_services():
     """Initialize receipt scanning services"""
     global gemini_extractor, firestore_service
     
     if not RECEIPT_SCANNING_AVAILABLE:
-        print("⚠️ Receipt scanning services not available")
+        logger.warning("⚠️ Receipt scanning services not available")
         return
     
     try:
@@ -128,52 +265,104 @@ def init_receipt_services():
         # Initialize Gemini extractor
         if gemini_api_key:
             gemini_extractor = GeminiReceiptExtractor(api_key=gemini_api_key)
-            print("✅ Gemini Receipt Extractor initialized")
+            logger.info("✅ Gemini Receipt Extractor initialized")
         else:
-            print("⚠️ GEMINI_API_KEY not found - receipt scanning disabled")
+            logger.warning("⚠️ GEMINI_API_KEY not found - receipt scanning disabled")
         
         # Initialize Firestore service
         firestore_service = FirestoreService(service_account_path=firestore_service_account)
         if firestore_service.is_connected():
-            print("✅ Firestore Service connected")
+            logger.info("✅ Firestore Service connected")
         else:
-            print("⚠️ Firestore Service not connected")
+            logger.warning("⚠️ Firestore Service not connected")
             
     except Exception as e:
-        print(f"❌ Error initializing receipt services: {str(e)}")
+        logger.error(f"❌ Error initializing receipt services: {str(e)}")
         gemini_extractor = None
         firestore_service = None
 
-def allowed_file(filename):
-    """Check if file extension is allowed"""
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
-def get_image_format(filename):
-    """Get image format from filename"""
-    if '.' not in filename:
-        return 'jpeg'
+def categorize_cache_key(description, amount, merchant_name=''):
+    """Cache key for a categorization request"""
+    return ((description or '').strip().lower(), amount, merchant_name.strip().lower())
+
+def clear_categorize_cache():
+    """Drop cached categorizations after the model has learned from a correction"""
+    with categorize_cache_lock:
+        categorize_cache.clear()
+
+def cached_user_response(key, build):
+    """Serve a per-user GET from the response cache, with ETag / 304 support"""
+    user_id = key[1]
+    with user_response_cache_lock:
+        entry = user_response_cache.get(key)
+        generation = (user_response_generations[None], user_response_generations.get(user_id, 0))
+    if entry is None:
+        body = app.json.dumps(build()).encode('utf-8')
+        entry = (generate_etag(body), body)
+        with user_response_cache_lock:
+            if generation == (user_response_generations[None], user_response_generations.get(user_id, 0)):
+                user_response_cache[key] = entry
     
-    extension = filename.rsplit('.', 1)[1].lower()
-    
-    format_mapping = {
-        'jpg': 'jpeg',
-        'jpeg': 'jpeg',
-        'png': 'png',
-        'gif': 'gif',
-        'bmp': 'bmp',
-        'webp': 'webp',
-        'heic': 'heic',
-        'heif': 'heif'
-    }
-    
-    return format_mapping.get(extension, 'jpeg')
+    etag, body = entry
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+def invalidate_user_responses(user_id=None):
+    """Drop cached responses for a user (or for everyone if the user is unknown)"""
+    with user_response_cache_lock:
+        user_response_generations[user_id] = user_response_generations.get(user_id, 0) + 1
+        if user_id is None:
+            user_response_cache.clear()
+            return
+        for key in [key for key in user_response_cache if key[1] == user_id]:
+            user_response_cache.pop(key, None)
+
+# Per-process sequence for processing ids
+_processing_id_counter = itertools.count()
+
+def new_processing_id():
+    """Time-sortable id: epoch ms + pid + per-process counter (no urandom read)"""
+    return f"{int(time.time() * 1000):012x}{os.getpid() & 0xffff:04x}{next(_processing_id_counter) & 0xffffffff:08x}"
+
+def classify_upload(filename):
+    """Return (allowed, image format) for an uploaded filename"""
+    _, sep, extension = filename.rpartition('.')
+    if not sep:
+        return False, None
+    image_format = EXT_TO_FMT.get(extension.lower())
+    return image_format is not None, image_format
+
+def invalid_request(error):
+    """400 response for a body that failed to decode or validate"""
+    return jsonify({
+        'error': f'Invalid request body: {str(error)}',
+        'status': 'invalid_request'
+    }), 400
 
 # === ROUTES ===
 
+@app.errorhandler(413)
+def request_too_large(e):
+    """Request body exceeded MAX_CONTENT_LENGTH (the receipt upload limit, applied to every endpoint)"""
+    if request.endpoint == 'upload_receipt':
+        return jsonify({
+            'error': f'File too large. Maximum size: {MAX_FILE_SIZE / (1024*1024):.1f}MB',
+            'status': 'file_too_large'
+        }), 413
+    return jsonify({
+        'error': 'Request body too large',
+        'status': 'request_too_large'
+    }), 413
+
 @app.route('/api/health', methods=['GET'])
 def health():
     """Comprehensive health check endpoint"""
+    now = time.monotonic()
+    if now - _health_cache['ts'] > 5:
+        _health_cache['fs'] = bool(firestore_service and firestore_service.is_connected())
+        _health_cache['ts'] = now
+    
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
@@ -181,14 +370,12 @@ def health():
         'services': {
             'ai_categorization': categorizer is not None,
             'receipt_scanning': gemini_extractor is not None,
-            'firestore': firestore_service is not None and firestore_service.is_connected() if firestore_service else False
+            'firestore': _health_cache['fs']
         },
         'ai_model': {
             'loaded': categorizer is not None,
-            'type': ('ultra-perfect' if USING_ULTRA_PERFECT_MODEL else 
-                    ('perfect' if USING_PERFECT_MODEL else 
-                     ('improved' if USING_IMPROVED_MODEL else 'original'))),
-            'categories': categorizer.get_categories() if categorizer else []
+            'type': BACKEND,
+            'categories': CATEGORIES
         },
         'receipt_scanning': {
             'available': RECEIPT_SCANNING_AVAILABLE and gemini_extractor is not None,
@@ -205,20 +392,34 @@ def categorize():
         return jsonify({'error': 'AI categorization model not loaded'}), 500
     
     try:
-        data = request.json
-        description = data.get('description', '')
-        amount = data.get('amount', None)
-        
-        # Use appropriate prediction method based on model type
-        if USING_ULTRA_PERFECT_MODEL or USING_PERFECT_MODEL or USING_IMPROVED_MODEL:
-            result = categorizer.predict(description, amount)
+        data = decode_request(request.get_data(cache=False), CategorizeRequest)
+        description = data.description or ''
+        amount = data.amount
+        # Only the transformer models score the merchant; the rule-based ones ignore it
+        merchant_name = (data.merchant_name or '') if CATEGORIZER_USES_MERCHANT else ''
+        
+        # Repeated descriptions are served from the cache
+        cache_key = categorize_cache_key(description, amount, merchant_name)
+        with categorize_cache_lock:
+            cached = categorize_cache.get(cache_key)
+        if cached is not None:
+            return jsonify(dict(cached))
+        
+        predictor = categorize_batcher or categorizer
+        if merchant_name:
+            result = predictor.predict(description, amount, merchant_name=merchant_name)
         else:
-            # Fallback to original method
-            merchant = data.get('merchant_name', '')
-            result = categorizer.predict_category(merchant, description, amount or 0.0)
+            result = predictor.predict(description, amount)
+        
+        with categorize_cache_lock:
+            categorize_cache[cache_key] = result
         
         return jsonify(result)
     
+    except msgspec.DecodeError as e:
+        return invalid_request(e)
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -229,26 +430,22 @@ def categorize_batch():
         return jsonify({'error': 'AI categorization model not loaded'}), 500
     
     try:
-        items = request.json.get('items', [])
+        items = decode_request(request.get_data(cache=False), CategorizeBatchRequest).items
         
-        if USING_ULTRA_PERFECT_MODEL or USING_PERFECT_MODEL or USING_IMPROVED_MODEL:
-            # Use enhanced batch prediction
-            descriptions = [item.get('description', '') for item in items]
-            amounts = [item.get('amount', None) for item in items]
-            results = categorizer.predict_batch(descriptions, amounts)
+        descriptions = [item.description or '' for item in items]
+        amounts = [item.amount for item in items]
+        merchant_names = [item.merchant_name or '' for item in items] if CATEGORIZER_USES_MERCHANT else []
+        if any(merchant_names):
+            results = categorizer.predict_batch(descriptions, amounts, merchant_names=merchant_names)
         else:
-            # Fallback to original method
-            results = []
-            for item in items:
-                result = categorizer.predict_category(
-                    item.get('merchant_name', ''), 
-                    item.get('description', ''), 
-                    item.get('amount', 0.0)
-                )
-                results.append(result)
+            results = categorizer.predict_batch(descriptions, amounts)
         
         return jsonify({'results': results})
     
+    except msgspec.DecodeError as e:
+        return invalid_request(e)
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -256,32 +453,41 @@ def categorize_batch():
 def correction():
     """Collect user corrections for active learning"""
     try:
-        correction_data = request.json
+        correction_data = decode_request(request.get_data(cache=False), CorrectionRequest)
+        # Null strings are kept as empty ones, like absent fields
+        correction_data.description = correction_data.description or ''
+        correction_data.correct_category = correction_data.correct_category or ''
+        correction_data.merchant_name = correction_data.merchant_name or ''
         
-        # Add correction to enhanced models if available
-        if (USING_ULTRA_PERFECT_MODEL or USING_PERFECT_MODEL or USING_IMPROVED_MODEL) and categorizer:
+        # Let the model learn from the correction if it supports it
+        if categorizer:
             categorizer.add_correction(
-                correction_data.get('description', ''),
-                correction_data.get('correct_category', ''),
-                correction_data.get('amount', None)
+                correction_data.description,
+                correction_data.correct_category,
+                correction_data.amount
             )
-        
-        # Ensure data directory exists
-        os.makedirs('data', exist_ok=True)
-        
-        # Append correction to CSV file
-        with open('data/corrections.csv', 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                correction_data.get('merchant_name', ''),
-                correction_data.get('description', ''),
-                correction_data.get('amount', 0.0),
-                correction_data.get('correct_category', '')
-            ])
-        
-        print(f"📝 Correction saved: {correction_data.get('description')} -> {correction_data.get('correct_category')}")
+            # Learned keywords can change the result for any cached description
+            clear_categorize_cache()
+        
+        # Buffer correction for the CSV log (flushed in the background)
+        correction_log.append([
+            correction_data.merchant_name,
+            correction_data.description,
+            correction_data.amount if correction_data.amount is not None else 0.0,
+            correction_data.correct_category
+        ])
+        
+        # Mirror to Firestore through the service's bulk writer (non-blocking)
+        if firestore_service and firestore_service.is_connected():
+            firestore_service.queue_correction(msgspec.structs.asdict(correction_data))
+        
+        logger.info(f"📝 Correction saved: {correction_data.description} -> {correction_data.correct_category}")
         return jsonify({'status': 'ok', 'message': 'Correction saved successfully'})
     
+    except msgspec.DecodeError as e:
+        return invalid_request(e)
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -291,7 +497,7 @@ def get_categories():
     if not categorizer:
         return jsonify({'error': 'AI categorization model not loaded'}), 500
     
-    return jsonify({'categories': categorizer.get_categories()})
+    return app.response_class(CATEGORIES_RESPONSE, mimetype='application/json')
 
 # === RECEIPT SCANNING ENDPOINTS ===
 
@@ -323,34 +529,22 @@ def upload_receipt():
                 'status': 'no_file'
             }), 400
         
-        # Check file extension
-        if not allowed_file(file.filename):
+        # Check file extension and determine image format
+        allowed, image_format = classify_upload(file.filename)
+        if not allowed:
             return jsonify({
                 'error': f'Unsupported file format. Allowed: {", ".join(ALLOWED_EXTENSIONS)}',
                 'status': 'invalid_format'
             }), 400
         
-        # Check file size
-        file.seek(0, 2)  # Seek to end
-        file_size = file.tell()
-        file.seek(0)  # Reset to beginning
-        
-        if file_size > MAX_FILE_SIZE:
-            return jsonify({
-                'error': f'File too large. Maximum size: {MAX_FILE_SIZE / (1024*1024):.1f}MB',
-                'status': 'file_too_large'
-            }), 400
-        
-        # Read image data
-        image_data = file.read()
+        # Read image data once (size is enforced by MAX_CONTENT_LENGTH)
+        image_data = file.stream.read()
         if not image_data:
             return jsonify({
                 'error': 'Empty file',
                 'status': 'empty_file'
             }), 400
-        
-        # Determine image format
-        image_format = get_image_format(file.filename)
+        file_size = len(image_data)
         
         logger.info(f"Processing receipt image for user {user_id}, format: {image_format}, size: {file_size} bytes")
         
@@ -368,7 +562,16 @@ def upload_receipt():
         extracted_data['user_id'] = user_id
         extracted_data['file_size'] = file_size
         extracted_data['file_format'] = image_format
-        extracted_data['processing_id'] = str(uuid.uuid4())
+        extracted_data['processing_id'] = new_processing_id()
+        
+        # Keep the original image for previews if local receipt storage is enabled.
+        # The URL is the only credential for the file, so the name carries a
+        # random token besides the (guessable) processing id
+        if RECEIPTS_DIR:
+            receipt_filename = f"{extracted_data['processing_id']}-{secrets.token_urlsafe(16)}.{image_format}"
+            with open(os.path.join(RECEIPTS_DIR, receipt_filename), 'wb') as f:
+                f.write(image_data)
+            extracted_data['image_url'] = f"/api/receipt-file/{receipt_filename}"
         
         logger.info(f"Successfully extracted receipt data: {extracted_data.get('merchant_name', 'Unknown')} - ${extracted_data.get('total_amount', 0)}")
         
@@ -378,6 +581,8 @@ def upload_receipt():
             'message': 'Receipt processed successfully'
         })
         
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
         logger.error(f"Error processing receipt: {str(e)}")
         return jsonify({
@@ -385,6 +590,23 @@ def upload_receipt():
             'status': 'processing_error'
         }), 500
 
+@app.route('/api/receipt-file/<filename>', methods=['GET'])
+def get_receipt_file(filename):
+    """Serve a stored receipt image (sendfile under gunicorn, X-Sendfile behind nginx)"""
+    if not RECEIPTS_DIR:
+        return jsonify({
+            'error': 'Receipt storage not enabled',
+            'status': 'service_unavailable'
+        }), 503
+    
+    # send_from_directory rejects paths outside RECEIPTS_DIR and answers
+    # conditional / range requests itself
+    response = send_from_directory(RECEIPTS_DIR, filename, etag=True, max_age=3600)
+    # Receipts are per user: browsers may cache them, shared caches may not
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
 @app.route('/api/save-expense', methods=['POST'])
 def save_expense():
     """Save extracted expense data to Firestore"""
@@ -396,21 +618,22 @@ def save_expense():
                 'status': 'service_unavailable'
             }), 503
         
-        data = request.json
+        data = decode_request(request.get_data(cache=False), Dict[str, Any])
         if not data:
             return jsonify({
                 'error': 'No data provided',
                 'status': 'missing_data'
             }), 400
         
-        user_id = data.get('user_id')
+        envelope = msgspec.convert(data, SaveExpenseRequest, strict=False)
+        user_id = envelope.user_id
         if not user_id:
             return jsonify({
                 'error': 'User ID is required',
                 'status': 'missing_user_id'
             }), 400
         
-        expense_data = data.get('expense_data', data)
+        expense_data = envelope.expense_data if envelope.expense_data is not None else data
         
         # Validate required expense fields
         if not expense_data.get('total_amount') and expense_data.get('total_amount') != 0:
@@ -423,6 +646,7 @@ def save_expense():
         
         # Save to Firestore
         saved_expense = firestore_service.save_expense(user_id, expense_data)
+        invalidate_user_responses(user_id)
         
         return jsonify({
             'status': 'success',
@@ -430,6 +654,10 @@ def save_expense():
             'message': 'Expense saved successfully'
         })
         
+    except msgspec.DecodeError as e:
+        return invalid_request(e)
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
         logger.error(f"Error saving expense: {str(e)}")
         return jsonify({
@@ -453,24 +681,27 @@ def get_user_expenses(user_id):
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         
-        # Get expenses from Firestore
-        expenses = firestore_service.get_user_expenses(
-            user_id=user_id,
-            limit=limit,
-            start_date=start_date,
-            end_date=end_date
-        )
-        
-        return jsonify({
-            'status': 'success',
-            'data': expenses,
-            'count': len(expenses),
-            'filters': {
-                'limit': limit,
-                'start_date': start_date,
-                'end_date': end_date
+        def build():
+            # Get expenses from Firestore
+            expenses = firestore_service.get_user_expenses(
+                user_id=user_id,
+                limit=limit,
+                start_date=start_date,
+                end_date=end_date
+            )
+            
+            return {
+                'status': 'success',
+                'data': expenses,
+                'count': len(expenses),
+                'filters': {
+                    'limit': limit,
+                    'start_date': start_date,
+                    'end_date': end_date
+                }
             }
-        })
+        
+        return cached_user_response(('expenses', user_id, limit, start_date, end_date), build)
         
     except Exception as e:
         logger.error(f"Error getting user expenses: {str(e)}")
@@ -523,12 +754,15 @@ def get_user_summary(user_id):
         if period not in ['week', 'month', 'year']:
             period = 'month'
         
-        summary = firestore_service.get_user_summary(user_id, period)
+        def build():
+            summary = firestore_service.get_user_summary(user_id, period)
+            
+            return {
+                'status': 'success',
+                'data': summary
+            }
         
-        return jsonify({
-            'status': 'success',
-            'data': summary
-        })
+        return cached_user_response(('summary', user_id, period), build)
         
     except Exception as e:
         logger.error(f"Error getting user summary: {str(e)}")
@@ -581,6 +815,8 @@ def update_expense(expense_id):
         success = firestore_service.update_expense(expense_id, data)
         
         if success:
+            # The owner is only known if the client sent it
+            invalidate_user_responses(data.get('user_id'))
             return jsonify({
                 'status': 'success',
                 'message': 'Expense updated successfully'
@@ -591,6 +827,8 @@ def update_expense(expense_id):
                 'status': 'update_failed'
             }), 500
             
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
         logger.error(f"Error updating expense: {str(e)}")
         return jsonify({
@@ -620,6 +858,7 @@ def delete_expense(expense_id):
         success = firestore_service.delete_expense(expense_id, user_id)
         
         if success:
+            invalidate_user_responses(user_id)
             return jsonify({
                 'status': 'success',
                 'message': 'Expense deleted successfully'
@@ -638,7 +877,7 @@ def delete_expense(expense_id):
         }), 500
 
 # Initialize services
-print("🚀 Initializing Finze Enhanced Backend...")
+logger.info("🚀 Initializing Finze Enhanced Backend...")
 init_ai_categorizer()
 init_receipt_services()
 
@@ -659,6 +898,7 @@ if __name__ == '__main__':
     if RECEIPT_SCANNING_AVAILABLE and gemini_extractor:
         print(f"   📷 Receipt Scanning:")
         print(f"       POST /api/upload-receipt")
+        print(f"       GET  /api/receipt-file/<filename>")
         print(f"       POST /api/save-expense")
         print(f"       GET  /api/expenses/<user_id>")
         print(f"       GET  /api/expense/<expense_id>")
@@ -8,6 +8,18 @@ echo "🚀 Starting Finze Backend Deployment..."
 echo "📦 Installing Python dependencies..."
 pip install -r requirements.txt
 
+# Compile the rule-based categorizer to a C extension with mypyc. Python
+# imports the built .so in place of the .py source; without it the plain
+# module is used, so a failed compile only costs speed
+echo "⚙️  Compiling perfect categorizer with mypyc..."
+pip install mypy==2.4.0 && mypyc --ignore-missing-imports --explicit-package-bases ml_model/perfect_categorizer.py \
+    || echo "⚠️  mypyc compile failed, using the pure Python categorizer"
+
+# Precompile bytecode so workers unmarshal the categorizers' large keyword
+# tables from .pyc files instead of recompiling the source on every start
+echo "📜 Precompiling Python bytecode..."
+python -m compileall -q app.py gunicorn.conf.py model_server.py ml_model services
+
 # Download ML models if needed
 echo "🤖 Setting up ML models..."
 python download_models.py
@@ -34,6 +46,32 @@ try:
 except Exception as e:
     print(f'⚠️  AI categorizer warning: {e}')
 
+try:
+    # A second build on the same model_path reloads the saved similarity index
+    # memory-mapped (read-only), which is the path the scoring kernel must accept
+    import tempfile
+    from ml_model.improved_transformer_categorizer import ImprovedTransformerCategorizer
+    with tempfile.TemporaryDirectory() as model_path:
+        for _ in range(2):
+            ImprovedTransformerCategorizer(model_path=model_path).predict('uber ride to airport', 250.0)
+    print('✅ Improved categorizer reload check successful')
+except Exception as e:
+    print(f'⚠️  Improved categorizer warning: {e}')
+
+try:
+    # Null string fields are accepted like absent ones
+    from app import app
+    client = app.test_client()
+    for path, body in (
+        ('/api/categorize', {'description': 'uber ride', 'merchant_name': None}),
+        ('/api/categorize-batch', {'items': [{'description': None, 'merchant_name': None}]}),
+    ):
+        status = client.post(path, json=body).status_code
+        assert status == 200, f'{path} answered {status} to null fields'
+    print('✅ Request null field check successful')
+except Exception as e:
+    print(f'⚠️  Request check warning: {e}')
+
 print('🎉 Backend services initialized!')
 "
 
@@ -5,11 +5,48 @@ Downloads the large DistilBERT model from cloud storage during deployment
 """
 
 import os
-import urllib.request
+import json
+import subprocess
+import tempfile
 import zipfile
 import shutil
 from pathlib import Path
 
+import requests
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from huggingface_hub import snapshot_download
+    HF_HUB_AVAILABLE = True
+except ImportError:
+    HF_HUB_AVAILABLE = False
+
+ONNX_MODEL_DIR = Path("models/expense_distilbert_onnx")
+
+LABELS = (
+    "Food & Dining",
+    "Transportation",
+    "Shopping",
+    "Entertainment",
+    "Technology",
+    "Bills & Utilities",
+    "Healthcare",
+    "Travel",
+    "Education",
+    "Business",
+    "Other"
+)
+
+def _dumps_indented(obj):
+    """Encode obj as indented JSON bytes"""
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2).encode("utf-8")
+
 def download_model():
     """Download and extract the expense categorization model"""
     
@@ -28,7 +65,18 @@ def download_model():
     # You'll need to upload your model to a cloud service (Google Drive, Dropbox, etc.)
     # and replace this URL with the actual download link
     
-    # Option 1: If you have the model hosted somewhere
+    # Option 1: If the model is on the Hugging Face Hub, fetch its files in parallel
+    hf_repo = os.environ.get('MODEL_HF_REPO')
+    if hf_repo and HF_HUB_AVAILABLE:
+        try:
+            print(f"Downloading from Hugging Face Hub: {hf_repo}")
+            snapshot_download(repo_id=hf_repo, local_dir=str(model_dir), max_workers=8)
+            print("✅ Model downloaded successfully")
+            return True
+        except Exception as e:
+            print(f"❌ Error downloading from Hugging Face Hub: {e}")
+    
+    # Option 2: If you have the model hosted somewhere as a zip
     model_url = os.environ.get('MODEL_DOWNLOAD_URL')
     
     if not model_url:
@@ -37,17 +85,19 @@ def download_model():
         return True
     
     try:
-        # Download the model zip file
-        zip_path = "temp_model.zip"
+        # Stream the zip into a spooled buffer (kept in memory up to 64MB) and
+        # extract from there, instead of writing and re-reading a temp file
         print(f"Downloading from: {model_url}")
-        urllib.request.urlretrieve(model_url, zip_path)
-        
-        # Extract the model
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall("models/")
-        
-        # Clean up
-        os.remove(zip_path)
+        with requests.get(model_url, stream=True, timeout=60) as response:
+            response.raise_for_status()
+            with tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024) as archive:
+                for chunk in response.iter_content(chunk_size=1 << 20):
+                    archive.write(chunk)
+                archive.seek(0)
+                
+                # Extract the model
+                with zipfile.ZipFile(archive, 'r') as zip_ref:
+                    zip_ref.extractall("models/")
         
         print("✅ Model downloaded and extracted successfully")
         return True
@@ -61,66 +111,75 @@ def download_model():
 def create_minimal_model(model_dir):
     """Create minimal model files for fallback"""
     
+    label2id = {label: i for i, label in enumerate(LABELS)}
+    id2label = {str(i): label for i, label in enumerate(LABELS)}
+    
     # Create basic config.json
     config = {
         "architectures": ["DistilBertForSequenceClassification"],
         "model_type": "distilbert",
-        "num_labels": 11,
-        "id2label": {
-            "0": "Food & Dining",
-            "1": "Transportation",
-            "2": "Shopping", 
-            "3": "Entertainment",
-            "4": "Technology",
-            "5": "Bills & Utilities",
-            "6": "Healthcare",
-            "7": "Travel",
-            "8": "Education",
-            "9": "Business",
-            "10": "Other"
-        },
-        "label2id": {
-            "Food & Dining": 0,
-            "Transportation": 1,
-            "Shopping": 2,
-            "Entertainment": 3,
-            "Technology": 4,
-            "Bills & Utilities": 5,
-            "Healthcare": 6,
-            "Travel": 7,
-            "Education": 8,
-            "Business": 9,
-            "Other": 10
-        }
-    }
-    
-    import json
-    with open(model_dir / "config.json", "w") as f:
-        json.dump(config, f, indent=2)
-    
-    # Create label map
-    label_map = {
-        "Food & Dining": 0,
-        "Transportation": 1,
-        "Shopping": 2,
-        "Entertainment": 3,
-        "Technology": 4,
-        "Bills & Utilities": 5,
-        "Healthcare": 6,
-        "Travel": 7,
-        "Education": 8,
-        "Business": 9,
-        "Other": 10
+        "num_labels": len(LABELS),
+        "id2label": id2label,
+        "label2id": label2id
     }
     
-    with open(model_dir / "label_map.json", "w") as f:
-        json.dump(label_map, f, indent=2)
+    # Create config and label map
+    (model_dir / "config.json").write_bytes(_dumps_indented(config))
+    (model_dir / "label_map.json").write_bytes(_dumps_indented(label2id))
     
     print("✅ Minimal model files created")
 
+def export_onnx_model(model_dir=Path("models/expense_distilbert"), onnx_dir=ONNX_MODEL_DIR):
+    """Export the DistilBERT model to ONNX and apply INT8 dynamic quantization"""
+    
+    quantized_path = onnx_dir / "model_int8.onnx"
+    if quantized_path.exists():
+        print("✅ Quantized ONNX model already exists, skipping export")
+        return True
+    
+    # The minimal fallback model has no weights to export
+    if not ((model_dir / "pytorch_model.bin").exists() or (model_dir / "model.safetensors").exists()):
+        print("⚠️  No model weights found, skipping ONNX export")
+        return False
+    
+    try:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+    except ImportError:
+        print("⚠️  onnxruntime not installed, skipping ONNX export")
+        return False
+    
+    try:
+        print("📦 Exporting model to ONNX...")
+        subprocess.run([
+            "optimum-cli", "export", "onnx",
+            "--task", "text-classification",
+            "--model", str(model_dir),
+            str(onnx_dir)
+        ], check=True)
+        
+        print("🗜️  Quantizing MatMul weights to INT8...")
+        quantize_dynamic(
+            str(onnx_dir / "model.onnx"),
+            str(quantized_path),
+            weight_type=QuantType.QInt8,
+            op_types_to_quantize=["MatMul"]
+        )
+        
+        # Save the offline graph optimizations once here so app start-up loads them
+        from ml_model.onnx_categorizer import create_session
+        create_session(str(quantized_path))
+        
+        print("✅ ONNX model exported and quantized successfully")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Error exporting ONNX model: {e}")
+        return False
+
 if __name__ == "__main__":
     success = download_model()
     if success:
+        export_onnx_model()
         print("🎉 Model setup complete!")
     else:
         print("⚠️  Using fallback model configuration")
\ No newline at end of file
@@ -0,0 +1,91 @@
+"""
+Gunicorn configuration for the Finze Backend
+Launch with: gunicorn -c gunicorn.conf.py app:app
+"""
+
+import gc
+import os
+import sys
+import threading
+import subprocess
+import multiprocessing
+
+# Bind to the same HOST/PORT the Flask app reads
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', '8001')}"
+
+# Multiple worker processes, each with a small thread pool so the
+# I/O-bound Gemini/Firestore endpoints don't block each other
+workers = int(os.environ.get('GUNICORN_WORKERS', 2 * multiprocessing.cpu_count() + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+
+# With several workers, one math thread per worker: otherwise each of the N
+# workers' torch/BLAS/ONNX Runtime pools spawns ~N threads (N^2 in total).
+# Set here because this file is read before the app (and torch) is imported.
+# Explicit environment settings win.
+_THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'ORT_INTRA')
+_pinned_thread_env = [var for var in _THREAD_ENV_VARS if var not in os.environ] if workers > 1 else []
+for _var in _pinned_thread_env:
+    os.environ[_var] = '1'
+
+# Load the app (and the AI categorizer) once in the master before forking,
+# so the model is shared copy-on-write across workers
+preload_app = True
+
+timeout = 120
+keepalive = 5
+
+# Access and error logs to stdout/stderr; stray prints from libraries go
+# through the error log instead of unsynchronized stdout writes
+accesslog = '-'
+errorlog = '-'
+capture_output = True
+
+# Render's /tmp is disk-backed; keep worker heartbeat files in memory
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+# Optional shared model server: one ONNX Runtime session for all workers,
+# restarted by a monitor thread in the master if it exits
+_model_server = None
+_model_server_lock = threading.Lock()
+_model_server_stopping = threading.Event()
+
+
+def _start_model_server(server):
+    global _model_server
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_server.py')
+    # The model server is the only process running inference: give it every core
+    env = {key: value for key, value in os.environ.items() if key not in _pinned_thread_env}
+    _model_server = subprocess.Popen([sys.executable, script], env=env)
+    server.log.info(f"Started model server (pid {_model_server.pid})")
+
+
+def _monitor_model_server(server):
+    while not _model_server_stopping.wait(1.0):
+        with _model_server_lock:
+            if _model_server_stopping.is_set() or _model_server.poll() is None:
+                continue
+            server.log.error(f"Model server exited with code {_model_server.returncode}, restarting")
+            _start_model_server(server)
+
+
+def on_starting(server):
+    if os.environ.get('MODEL_SERVER_SOCKET'):
+        with _model_server_lock:
+            _start_model_server(server)
+        threading.Thread(target=_monitor_model_server, args=(server,), name='model-server-monitor', daemon=True).start()
+
+
+def pre_fork(server, worker):
+    # Move everything the master preloaded (app, categorizer tables) into the
+    # GC's permanent generation, so collections in the workers don't write to
+    # those objects and un-share their copy-on-write pages
+    gc.freeze()
+
+
+def on_exit(server):
+    _model_server_stopping.set()
+    with _model_server_lock:
+        if _model_server and _model_server.poll() is None:
+            _model_server.terminate()
+            _model_server.wait(timeout=10)
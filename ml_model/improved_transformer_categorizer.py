@@ -8,10 +8,124 @@ import json
 import os
 import pickle
 import re
+import bisect
+import functools
 from typing import Dict, List, Tuple, Optional
 import numpy as np
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+try:
+    from numba import njit, types
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+def _score_kernel(desc_ids, unknown, pattern_conf, train_ids_flat, train_offsets, cat_of_ex,
+                  amount_factors, has_amount, skip_similarity):
+    """
+    Combined pattern, similarity and amount score of one description for every
+    category, before normalization. Examples are stored CSR-style as sorted
+    unique word IDs, so the word-set Jaccard is a two-pointer merge.
+    """
+    n_categories = pattern_conf.shape[0]
+    n_desc = desc_ids.shape[0]
+    similarity = np.zeros(n_categories)
+    
+    for ex in range(cat_of_ex.shape[0]):
+        start = train_offsets[ex]
+        end = train_offsets[ex + 1]
+        if skip_similarity or end == start or (n_desc == 0 and unknown == 0):
+            continue
+        
+        i = start
+        j = 0
+        intersection = 0
+        while i < end and j < n_desc:
+            if train_ids_flat[i] == desc_ids[j]:
+                intersection += 1
+                i += 1
+                j += 1
+            elif train_ids_flat[i] < desc_ids[j]:
+                i += 1
+            else:
+                j += 1
+        
+        union = n_desc + unknown + (end - start) - intersection
+        jaccard = intersection / union
+        if jaccard > similarity[cat_of_ex[ex]]:
+            similarity[cat_of_ex[ex]] = jaccard
+    
+    scores = np.empty(n_categories)
+    for c in range(n_categories):
+        combined = (pattern_conf[c] * 0.7) + (similarity[c] * 0.3)
+        if has_amount:
+            combined = min(combined * amount_factors[c], 0.95)
+        scores[c] = max(combined, 0.05)
+    
+    return scores
+
+
+if NUMBA_AVAILABLE:
+    # Compiled eagerly at import; no fastmath, so scores stay bit-identical to the Python path.
+    # The training arrays are read-only when memory-mapped from a saved index
+    # (writable ones, freshly built, convert to the read-only type)
+    _score_kernel = njit(
+        types.float64[:](
+            types.int32[:], types.int64, types.float64[:],
+            types.Array(types.int32, 1, 'C', readonly=True), types.Array(types.int32, 1, 'C', readonly=True),
+            types.Array(types.int8, 1, 'C', readonly=True), types.float64[:], types.boolean, types.boolean
+        ),
+        cache=True
+    )(_score_kernel)
+
+
 class ImprovedTransformerCategorizer:
+    # Typical amount range per category: (min, max)
+    AMOUNT_RANGES = {
+        'Food & Dining': (5, 500),      # ₹5 to ₹500 typical
+        'Transportation': (10, 1000),    # ₹10 to ₹1000
+        'Shopping': (50, 5000),          # ₹50 to ₹5000
+        'Entertainment': (20, 2000),     # ₹20 to ₹2000
+        'Technology': (500, 50000),      # ₹500 to ₹50000
+        'Bills & Utilities': (100, 10000), # ₹100 to ₹10000
+        'Healthcare': (50, 5000),        # ₹50 to ₹5000
+        'Travel': (500, 25000),          # ₹500 to ₹25000
+        'Education': (100, 20000),       # ₹100 to ₹20000
+        'Business': (100, 10000),        # ₹100 to ₹10000
+        'Other': (1, 100000)             # Any amount
+    }
+    
+    TRAINING_DATA_PATH = 'training_data/comprehensive_dataset.json'
+    
+    # Key terms for each category
+    CATEGORY_KEYWORDS = {
+        'Food & Dining': ['food', 'eat', 'lunch', 'dinner', 'breakfast', 'restaurant', 'cafe', 'coffee', 'grocery', 'meal', 'snack', 'drink', 'beverage'],
+        'Transportation': ['uber', 'taxi', 'bus', 'train', 'flight', 'car', 'bike', 'fuel', 'petrol', 'ride', 'transport', 'travel', 'parking'],
+        'Shopping': ['amazon', 'shopping', 'buy', 'purchase', 'clothes', 'shoes', 'electronics', 'home', 'appliance', 'order', 'delivery'],
+        'Entertainment': ['movie', 'cinema', 'music', 'concert', 'show', 'game', 'netflix', 'spotify', 'entertainment', 'fun', 'hobby', 'gym'],
+        'Technology': ['phone', 'laptop', 'computer', 'software', 'app', 'tech', 'device', 'gadget', 'electronic', 'digital', 'camera', 'headphone'],
+        'Bills & Utilities': ['bill', 'electricity', 'water', 'gas', 'internet', 'rent', 'insurance', 'tax', 'payment', 'utility', 'service'],
+        'Healthcare': ['doctor', 'medical', 'hospital', 'medicine', 'health', 'treatment', 'pharmacy', 'dental', 'checkup', 'therapy'],
+        'Travel': ['travel', 'trip', 'vacation', 'hotel', 'flight', 'tour', 'holiday', 'booking', 'visa', 'luggage', 'resort'],
+        'Education': ['school', 'college', 'education', 'course', 'class', 'training', 'book', 'study', 'fees', 'tuition', 'exam'],
+        'Business': ['business', 'office', 'work', 'professional', 'meeting', 'supplies', 'equipment', 'marketing', 'client', 'company'],
+        'Other': ['misc', 'other', 'cash', 'atm', 'investment', 'charity', 'gift', 'emergency', 'personal', 'random']
+    }
+    
+    # Common stop words ignored when extracting keywords
+    STOP_WORDS = frozenset({'a', 'an', 'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'should', 'could', 'can', 'may', 'might', 'must', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'this', 'that', 'these', 'those'})
+    
+    # Skip the similarity pass when one category's pattern confidence is above
+    # SHORT_CIRCUIT_CONFIDENCE and every other one is below SHORT_CIRCUIT_RUNNER_UP
+    SHORT_CIRCUIT_CONFIDENCE = 0.8
+    SHORT_CIRCUIT_RUNNER_UP = 0.3
+
     def __init__(self, model_path: str = "models/improved_expense_categorizer"):
         self.model_path = model_path
         self.categories = [
@@ -31,11 +145,55 @@ class ImprovedTransformerCategorizer:
         # Load comprehensive pattern mappings for high confidence predictions
         self.category_patterns = self._load_category_patterns()
         
-        # Load training data for similarity matching
-        self.training_examples = self._load_training_examples()
+        self._word_re = re.compile(r'\b[a-zA-Z]+\b')
+        
+        # Every pattern is a \b(a|b|...)\b word alternation, so a pattern hits exactly
+        # when one of the description's \w+ tokens is among its words. Map each word
+        # to the (category index, pattern index) pairs containing it, so one token
+        # scan scores all categories. (A single named-group alternation would credit
+        # a word shared by several categories to the first group only.)
+        # The same token lookup also yields the category keyword matches: a
+        # keyword that _extract_keywords keeps on its own is found by it exactly
+        # when it occurs as a \w+ token
+        self._token_re = re.compile(r'\w+')
+        self._cat_keyword_sets: Dict[str, frozenset] = {k: frozenset(v) for k, v in self.CATEGORY_KEYWORDS.items()}
+        self._word_patterns: Dict[str, List[Tuple[int, int]]] = {}
+        self._word_keyword_categories: Dict[str, List[int]] = {}
+        for ci, category in enumerate(self.categories):
+            for pi, pattern in enumerate(self.category_patterns.get(category, [])):
+                for word in set(pattern[len(r'\b('):-len(r')\b')].split('|')):
+                    self._word_patterns.setdefault(word, []).append((ci, pi))
+            for word in self._cat_keyword_sets.get(category, ()):
+                if self._extract_keywords(word) == [word]:
+                    self._word_keyword_categories.setdefault(word, []).append(ci)
+        
+        # Both lookups merged into one table, so each token costs a single probe
+        self._token_hits: Dict[str, Tuple[frozenset, Tuple[int, ...]]] = {
+            word: (frozenset(self._word_patterns.get(word, ())), tuple(self._word_keyword_categories.get(word, ())))
+            for word in self._word_patterns.keys() | self._word_keyword_categories.keys()
+        }
+        
+        # Load training data for similarity matching; only the tokenized
+        # examples are kept
+        self._load_similarity_index()
+        self._build_batch_tables()
+        
+        # Descriptions repeat a lot (same merchants); memoize per instance
+        self._predict_cached = functools.lru_cache(maxsize=20000)(self._predict_impl)
+        self._blank_scores = np.full(len(self.categories), 0.1)
+        self._blank_scores.flags.writeable = False
+        self._empty_response = {
+            'category': 'Other',
+            'confidence': 0.5,
+            'all_probabilities': {cat: 0.1 for cat in self.categories},
+            'suggested': [('Other', 0.5)]
+        }
+        
+        # Descriptions scored without the similarity pass, for tuning the short-circuit thresholds
+        self.similarity_skips = 0
         
         print(f"✅ Improved categorizer loaded with {len(self.categories)} categories")
-        print(f"📚 Using {len(self.training_examples)} training examples for matching")
+        print(f"📚 Using {len(self._cat_ex_slice)} training examples for matching")
 
     def _load_category_patterns(self) -> Dict[str, List[str]]:
         """Load comprehensive patterns for each category"""
@@ -95,191 +253,465 @@ class ImprovedTransformerCategorizer:
             ]
         }
 
-    def _load_training_examples(self) -> Dict[str, List[str]]:
-        """Load training examples for similarity matching"""
+    def _load_training_examples(self) -> Dict[str, List[List[int]]]:
+        """
+        Load training examples for similarity matching, tokenized while reading
+        into sorted unique word IDs (building self._vocab)
+        """
+        self._vocab: Dict[str, int] = {}
         try:
-            with open('training_data/comprehensive_dataset.json', 'r') as f:
-                data = json.load(f)
+            with open(self.TRAINING_DATA_PATH, 'rb') as f:
+                data = _json_loads(f.read())
             
             examples_by_category = {}
             for item in data:
-                category = item['category']
-                if category not in examples_by_category:
-                    examples_by_category[category] = []
-                examples_by_category[category].append(item['description'].lower())
+                examples = examples_by_category.setdefault(item['category'], [])
+                if len(examples) < 20:  # Check top 20 examples for performance
+                    examples.append(sorted({
+                        self._vocab.setdefault(word, len(self._vocab)) for word in item['description'].lower().split()
+                    }))
             
             return examples_by_category
         except FileNotFoundError:
             print("⚠️  Training data not found, using pattern matching only")
             return {}
 
-    def _calculate_pattern_confidence(self, description: str, category: str) -> float:
-        """Calculate confidence based on pattern matching"""
-        patterns = self.category_patterns.get(category, [])
-        description_lower = description.lower()
+    def _score_all_categories(self, description_lower: str) -> Tuple[List[int], List[int]]:
+        """
+        Count matching patterns and matching keywords for every category in
+        one pass over the description's tokens
+        """
+        hit_patterns = set()
+        keyword_matches = [0] * len(self.categories)
+        for token in set(self._token_re.findall(description_lower)):
+            hits = self._token_hits.get(token)
+            if hits is None:
+                continue
+            hit_patterns |= hits[0]
+            for ci in hits[1]:
+                keyword_matches[ci] += 1
         
-        matches = 0
-        total_patterns = len(patterns)
+        pattern_matches = [0] * len(self.categories)
+        for ci, _ in hit_patterns:
+            pattern_matches[ci] += 1
+        return pattern_matches, keyword_matches
+
+    def _calculate_pattern_confidence(self, category: str, matches: int, keyword_matches: int) -> float:
+        """Calculate confidence based on pattern matching"""
+        total_patterns = len(self.category_patterns.get(category, []))
         
         if total_patterns == 0:
             return 0.1
         
-        for pattern in patterns:
-            if re.search(pattern, description_lower):
-                matches += 1
-        
         # Base confidence from pattern matching
         pattern_confidence = matches / total_patterns
         
         # Boost confidence for exact keyword matches
-        keywords = self._extract_keywords(description_lower)
-        category_keywords = self._get_category_keywords(category)
-        
-        keyword_matches = len(set(keywords) & set(category_keywords))
         keyword_boost = min(keyword_matches * 0.1, 0.3)
         
         return min(pattern_confidence + keyword_boost, 0.95)
 
-    def _calculate_similarity_confidence(self, description: str, category: str) -> float:
-        """Calculate confidence based on similarity to training examples"""
-        if category not in self.training_examples:
-            return 0.0
+    def _load_similarity_index(self):
+        """
+        Load the tokenized examples saved under model_path, or tokenize the
+        dataset and save them when the saved copy is missing or out of date
+        """
+        if not self._read_similarity_index():
+            self._build_similarity_index(self._load_training_examples())
+            self._write_similarity_index()
+        self._index_examples()
+
+    def _read_similarity_index(self) -> bool:
+        """Memory-map the saved token buffers if they match the current dataset"""
+        try:
+            with open(os.path.join(self.model_path, 'training_index.json'), 'rb') as f:
+                meta = _json_loads(f.read())
+            stat = os.stat(self.TRAINING_DATA_PATH)
+            if (meta['source_mtime_ns'], meta['source_size'], meta['categories']) != (stat.st_mtime_ns, stat.st_size, self.categories):
+                return False
+            
+            # Demand-paged from disk and shared through the page cache by all workers
+            arrays = [
+                np.asarray(np.load(os.path.join(self.model_path, f'{name}.npy'), mmap_mode='r'))
+                for name in ('training_tokens', 'training_offsets', 'training_categories')
+            ]
+        except (OSError, ValueError, KeyError):
+            return False
         
-        description_lower = description.lower()
-        examples = self.training_examples[category]
+        self._tokens, self._ex_offsets, self._cat_of_ex = arrays
+        self._vocab = {word: word_id for word_id, word in enumerate(meta['vocab'])}
+        return True
+
+    def _write_similarity_index(self):
+        """Save the token buffers next to the model for the next start"""
+        try:
+            stat = os.stat(self.TRAINING_DATA_PATH)
+            os.makedirs(self.model_path, exist_ok=True)
+            for name, array in (('training_tokens', self._tokens), ('training_offsets', self._ex_offsets),
+                                ('training_categories', self._cat_of_ex)):
+                path = os.path.join(self.model_path, f'{name}.npy')
+                with open(path + '.tmp', 'wb') as f:
+                    np.save(f, array)
+                os.replace(path + '.tmp', path)
+            
+            # Written last: it marks the arrays as complete
+            meta = {
+                'source_mtime_ns': stat.st_mtime_ns,
+                'source_size': stat.st_size,
+                'categories': self.categories,
+                'vocab': sorted(self._vocab, key=self._vocab.get)
+            }
+            path = os.path.join(self.model_path, 'training_index.json')
+            with open(path + '.tmp', 'w') as f:
+                json.dump(meta, f)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            print(f"⚠️  Could not save training index: {e}")
+
+    def _build_similarity_index(self, training_examples: Dict[str, List[List[int]]]):
+        """
+        Pack the tokenized training examples into one contiguous buffer of word
+        IDs: example e spans _tokens[_ex_offsets[e]:_ex_offsets[e + 1]]
+        """
+        tokens: List[int] = []
+        offsets = [0]
+        cat_of_ex: List[int] = []
         
-        max_similarity = 0.0
-        for example in examples[:20]:  # Check top 20 examples for performance
-            similarity = self._simple_similarity(description_lower, example)
-            max_similarity = max(max_similarity, similarity)
+        for ci, category in enumerate(self.categories):
+            for word_ids in training_examples.get(category, []):
+                tokens.extend(word_ids)
+                offsets.append(len(tokens))
+                cat_of_ex.append(ci)
         
-        return max_similarity
+        self._tokens = np.array(tokens, dtype=np.int32)
+        self._ex_offsets = np.array(offsets, dtype=np.int32)
+        self._cat_of_ex = np.array(cat_of_ex, dtype=np.int8)
 
-    def _simple_similarity(self, text1: str, text2: str) -> float:
-        """Calculate simple word-based similarity"""
-        words1 = set(text1.split())
-        words2 = set(text2.split())
+    def _index_examples(self):
+        """Per-category example ranges and the word-to-example inverted index"""
+        cat_of_ex = self._cat_of_ex.tolist()
+        offsets = self._ex_offsets.tolist()
+        tokens = self._tokens.tolist()
         
-        if not words1 or not words2:
-            return 0.0
+        # Examples are stored grouped by category
+        self._cat_ex_slice: Dict[str, slice] = {}
+        for example, ci in enumerate(cat_of_ex):
+            start = self._cat_ex_slice[self.categories[ci]].start if self.categories[ci] in self._cat_ex_slice else example
+            self._cat_ex_slice[self.categories[ci]] = slice(start, example + 1)
         
-        intersection = len(words1 & words2)
-        union = len(words1 | words2)
+        # Inverted index from word ID to the matched examples containing it, so a
+        # description only visits the examples it shares a word with
+        self._word_examples: Dict[int, List[int]] = {}
+        for example in range(len(cat_of_ex)):
+            for word_id in tokens[offsets[example]:offsets[example + 1]]:
+                self._word_examples.setdefault(word_id, []).append(example)
+        self._example_category = cat_of_ex
+        self._example_word_counts = np.diff(self._ex_offsets).tolist()
+
+    def _build_batch_tables(self):
+        """Per-category constants and the example word matrix used by predict_batch"""
+        n_categories = len(self.categories)
+        self._pattern_totals = np.array([len(self.category_patterns.get(c, [])) for c in self.categories], dtype=np.float64)
+        self._no_amount_factors = np.ones(n_categories)
+        
+        # Every amount test compares against one of these breakpoints, so the
+        # multipliers are constant on each breakpoint and on each open interval
+        # between them. Region 2i+1 is breakpoint i, region 2i the interval below it
+        breakpoints = sorted({v for lo, hi in self.AMOUNT_RANGES.values() for v in (lo, hi, hi * 2, lo * 0.5)})
+        representatives = [breakpoints[0] - 1]
+        for left, right in zip(breakpoints, breakpoints[1:] + [breakpoints[-1] + 2]):
+            representatives += [left, (left + right) / 2]
+        self._amount_breakpoints = breakpoints
+        self._amount_region_factors = [self._scan_amount_factors(amount) for amount in representatives]
+        self._amount_region_table = np.array(self._amount_region_factors, dtype=np.float64)
         
-        return intersection / union if union > 0 else 0.0
+        # One row per matched example, one column per vocabulary word. 0/1 entries
+        # and their dot products (word counts) are exact in float32
+        n_examples = len(self._cat_of_ex)
+        example_sizes = np.diff(self._ex_offsets)
+        self._example_matrix = np.zeros((n_examples, len(self._vocab)), dtype=np.float32)
+        self._example_matrix[np.repeat(np.arange(n_examples), example_sizes), self._tokens] = 1
+        self._example_sizes = example_sizes.astype(np.float64)
+        self._example_columns: List[np.ndarray] = [
+            np.arange(self._cat_ex_slice[c].start, self._cat_ex_slice[c].stop) if c in self._cat_ex_slice
+            else np.arange(0) for c in self.categories
+        ]
+        self._n_categories = n_categories
 
-    def _extract_keywords(self, text: str) -> List[str]:
-        """Extract meaningful keywords from text"""
-        # Remove common stop words and extract keywords
-        stop_words = {'a', 'an', 'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'should', 'could', 'can', 'may', 'might', 'must', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'this', 'that', 'these', 'those'}
+    def _description_ids(self, description_lower: str) -> Tuple[List[int], int]:
+        """
+        Sorted unique word IDs of the description's known words, plus the
+        number of its distinct words that appear in no training example
+        """
+        word_ids = []
+        unknown = 0
+        for word in set(description_lower.split()):
+            word_id = self._vocab.get(word)
+            if word_id is None:
+                unknown += 1
+            else:
+                word_ids.append(word_id)
+        word_ids.sort()
+        return word_ids, unknown
+
+    def _calculate_similarity_confidence(self, description_ids: Tuple[List[int], int]) -> List[float]:
+        """Best word-set Jaccard similarity to each category's training examples"""
+        word_ids, unknown = description_ids
         
-        words = re.findall(r'\b[a-zA-Z]+\b', text.lower())
-        return [word for word in words if word not in stop_words and len(word) > 2]
+        # Shared-word counts of the examples that share at least one word;
+        # every other example has similarity 0
+        intersections: Dict[int, int] = {}
+        for word_id in word_ids:
+            for example in self._word_examples.get(word_id, ()):
+                intersections[example] = intersections.get(example, 0) + 1
+        
+        size = len(word_ids) + unknown
+        max_similarity = [0.0] * len(self.categories)
+        for example, intersection in intersections.items():
+            similarity = intersection / (size + self._example_word_counts[example] - intersection)
+            ci = self._example_category[example]
+            if similarity > max_similarity[ci]:
+                max_similarity[ci] = similarity
+        
+        return max_similarity
 
-    def _get_category_keywords(self, category: str) -> List[str]:
-        """Get key terms for each category"""
-        category_keywords = {
-            'Food & Dining': ['food', 'eat', 'lunch', 'dinner', 'breakfast', 'restaurant', 'cafe', 'coffee', 'grocery', 'meal', 'snack', 'drink', 'beverage'],
-            'Transportation': ['uber', 'taxi', 'bus', 'train', 'flight', 'car', 'bike', 'fuel', 'petrol', 'ride', 'transport', 'travel', 'parking'],
-            'Shopping': ['amazon', 'shopping', 'buy', 'purchase', 'clothes', 'shoes', 'electronics', 'home', 'appliance', 'order', 'delivery'],
-            'Entertainment': ['movie', 'cinema', 'music', 'concert', 'show', 'game', 'netflix', 'spotify', 'entertainment', 'fun', 'hobby', 'gym'],
-            'Technology': ['phone', 'laptop', 'computer', 'software', 'app', 'tech', 'device', 'gadget', 'electronic', 'digital', 'camera', 'headphone'],
-            'Bills & Utilities': ['bill', 'electricity', 'water', 'gas', 'internet', 'rent', 'insurance', 'tax', 'payment', 'utility', 'service'],
-            'Healthcare': ['doctor', 'medical', 'hospital', 'medicine', 'health', 'treatment', 'pharmacy', 'dental', 'checkup', 'therapy'],
-            'Travel': ['travel', 'trip', 'vacation', 'hotel', 'flight', 'tour', 'holiday', 'booking', 'visa', 'luggage', 'resort'],
-            'Education': ['school', 'college', 'education', 'course', 'class', 'training', 'book', 'study', 'fees', 'tuition', 'exam'],
-            'Business': ['business', 'office', 'work', 'professional', 'meeting', 'supplies', 'equipment', 'marketing', 'client', 'company'],
-            'Other': ['misc', 'other', 'cash', 'atm', 'investment', 'charity', 'gift', 'emergency', 'personal', 'random']
-        }
-        return category_keywords.get(category, [])
+    def _extract_keywords(self, text_lower: str) -> List[str]:
+        """Extract meaningful keywords from already lowercased text"""
+        # Remove common stop words and extract keywords
+        words = self._word_re.findall(text_lower)
+        return [word for word in words if word not in self.STOP_WORDS and len(word) > 2]
 
     def predict(self, description: str, amount: Optional[float] = None) -> Dict:
         """Predict category with improved confidence scoring"""
         if not description or not description.strip():
+            # Copy the nested containers too, so callers can't alter the shared response
+            empty = self._empty_response
             return {
-                'category': 'Other',
-                'confidence': 0.5,
-                'all_probabilities': {cat: 0.1 for cat in self.categories},
-                'suggested': [('Other', 0.5)]
+                'category': empty['category'],
+                'confidence': empty['confidence'],
+                'all_probabilities': dict(empty['all_probabilities']),
+                'suggested': list(empty['suggested'])
             }
         
-        # Calculate confidence for each category
-        category_scores = {}
+        # Only the per-category amount adjustment depends on the amount, so
+        # amounts that adjust every category the same way share a cache entry
+        top_index, top_confidence, scores, suggested = self._predict_cached(
+            description.strip().lower(), self._amount_factors(amount)
+        )
+        probabilities = scores.tolist()
+        return {
+            'category': self.categories[top_index],
+            'confidence': top_confidence,
+            'all_probabilities': dict(zip(self.categories, probabilities)),
+            'suggested': [(self.categories[ci], probabilities[ci]) for ci in suggested]
+        }
+
+    def predict_array(self, description: str, amount: Optional[float] = None) -> Tuple[int, float, np.ndarray]:
+        """
+        Like predict(), without building the result dicts.
         
-        for category in self.categories:
-            # Pattern-based confidence
-            pattern_conf = self._calculate_pattern_confidence(description, category)
-            
-            # Similarity-based confidence
-            similarity_conf = self._calculate_similarity_confidence(description, category)
-            
-            # Combine confidences with weights
-            combined_confidence = (pattern_conf * 0.7) + (similarity_conf * 0.3)
-            
-            # Amount-based adjustments
-            if amount is not None:
-                combined_confidence = self._adjust_confidence_by_amount(combined_confidence, category, amount)
+        Returns:
+            Index of the top category in self.categories, its confidence, and
+            the read-only array of normalized scores in category order
+        """
+        if not description or not description.strip():
+            return self.categories.index('Other'), 0.5, self._blank_scores
+        
+        top_index, top_confidence, scores, _ = self._predict_cached(
+            description.strip().lower(), self._amount_factors(amount)
+        )
+        return top_index, top_confidence, scores
+
+    def _predict_impl(self, description_lower: str, amount_factors: Optional[Tuple[float, ...]]) -> Tuple:
+        """Score a normalized description; returns immutable parts of the result for caching"""
+        pattern_matches, keyword_matches = self._score_all_categories(description_lower)
+        
+        # Pattern-based confidence
+        pattern_conf = [
+            self._calculate_pattern_confidence(category, pattern_matches[ci], keyword_matches[ci])
+            for ci, category in enumerate(self.categories)
+        ]
+        runner_up, best = sorted(pattern_conf)[-2:]
+        skip_similarity = best > self.SHORT_CIRCUIT_CONFIDENCE and runner_up < self.SHORT_CIRCUIT_RUNNER_UP
+        if skip_similarity:
+            self.similarity_skips += 1
+        
+        # Calculate confidence for each category
+        if NUMBA_AVAILABLE:
+            word_ids, unknown = self._description_ids(description_lower)
+            scores = _score_kernel(
+                np.array(word_ids, dtype=np.int32), unknown, np.array(pattern_conf),
+                self._tokens, self._ex_offsets, self._cat_of_ex,
+                self._no_amount_factors if amount_factors is None else np.array(amount_factors),
+                amount_factors is not None, skip_similarity
+            )
+        else:
+            scores = np.empty(len(self.categories))
+            if skip_similarity:
+                similarity = [0.0] * len(self.categories)
+            else:
+                similarity = self._calculate_similarity_confidence(self._description_ids(description_lower))
             
-            category_scores[category] = max(combined_confidence, 0.05)  # Minimum confidence
+            for ci in range(len(self.categories)):
+                # Combine with similarity-based confidence
+                combined_confidence = (pattern_conf[ci] * 0.7) + (similarity[ci] * 0.3)
+                
+                # Amount-based adjustments
+                if amount_factors is not None:
+                    combined_confidence = min(combined_confidence * amount_factors[ci], 0.95)
+                
+                scores[ci] = max(combined_confidence, 0.05)  # Minimum confidence
         
-        # Normalize scores to sum to 1.0
-        total_score = sum(category_scores.values())
+        # Normalize scores to sum to 1.0 (summed left to right, not pairwise like ndarray.sum)
+        total_score = sum(scores.tolist())
         if total_score > 0:
-            normalized_scores = {cat: score/total_score for cat, score in category_scores.items()}
+            scores /= total_score
         else:
-            normalized_scores = {cat: 1.0/len(self.categories) for cat in self.categories}
-        
-        # Get top prediction
-        top_category = max(normalized_scores, key=normalized_scores.get)
-        top_confidence = normalized_scores[top_category]
+            scores[:] = 1.0 / len(self.categories)
         
-        # Create suggested categories (top 3)
-        sorted_categories = sorted(normalized_scores.items(), key=lambda x: x[1], reverse=True)
-        suggested = sorted_categories[:3]
+        # Top 3 by descending score, ties kept in category order. For a handful
+        # of categories a stable sort of the Python list beats numpy call overhead
+        probabilities = scores.tolist()
+        suggested = sorted(range(len(probabilities)), key=probabilities.__getitem__, reverse=True)[:3]
+        top_index = suggested[0]
+        top_confidence = probabilities[top_index]
         
         # Boost confidence if it's a clear match
         if top_confidence > 0.6:
             top_confidence = min(top_confidence * 1.2, 0.95)
         
-        return {
-            'category': top_category,
-            'confidence': top_confidence,
-            'all_probabilities': normalized_scores,
-            'suggested': suggested
-        }
+        # Shared by every cache hit
+        scores.flags.writeable = False
+        return top_index, top_confidence, scores, tuple(suggested)
 
-    def _adjust_confidence_by_amount(self, confidence: float, category: str, amount: float) -> float:
-        """Adjust confidence based on typical amount ranges for categories"""
-        amount_adjustments = {
-            'Food & Dining': (5, 500),      # ₹5 to ₹500 typical
-            'Transportation': (10, 1000),    # ₹10 to ₹1000
-            'Shopping': (50, 5000),          # ₹50 to ₹5000
-            'Entertainment': (20, 2000),     # ₹20 to ₹2000
-            'Technology': (500, 50000),      # ₹500 to ₹50000
-            'Bills & Utilities': (100, 10000), # ₹100 to ₹10000
-            'Healthcare': (50, 5000),        # ₹50 to ₹5000
-            'Travel': (500, 25000),          # ₹500 to ₹25000
-            'Education': (100, 20000),       # ₹100 to ₹20000
-            'Business': (100, 10000),        # ₹100 to ₹10000
-            'Other': (1, 100000)             # Any amount
-        }
-        
-        if category in amount_adjustments:
-            min_amt, max_amt = amount_adjustments[category]
-            if min_amt <= amount <= max_amt:
-                confidence *= 1.1  # Boost confidence if amount is typical
-            elif amount > max_amt * 2 or amount < min_amt * 0.5:
-                confidence *= 0.9  # Reduce confidence if amount is very atypical
+    def _amount_factors(self, amount: Optional[float]) -> Optional[Tuple[float, ...]]:
+        """Per-category confidence multipliers based on typical amount ranges"""
+        if amount is None:
+            return None
+        if amount != amount:
+            return self._scan_amount_factors(amount)  # NaN is in no range
         
-        return min(confidence, 0.95)
+        i = bisect.bisect_left(self._amount_breakpoints, amount)
+        on_breakpoint = i < len(self._amount_breakpoints) and self._amount_breakpoints[i] == amount
+        return self._amount_region_factors[2 * i + on_breakpoint]
+
+    def _scan_amount_factors(self, amount: float) -> Tuple[float, ...]:
+        """Evaluate the amount multipliers category by category"""
+        factors = []
+        for category in self.categories:
+            factor = 1.0
+            if category in self.AMOUNT_RANGES:
+                min_amt, max_amt = self.AMOUNT_RANGES[category]
+                if min_amt <= amount <= max_amt:
+                    factor = 1.1  # Boost confidence if amount is typical
+                elif amount > max_amt * 2 or amount < min_amt * 0.5:
+                    factor = 0.9  # Reduce confidence if amount is very atypical
+            factors.append(factor)
+        return tuple(factors)
 
     def predict_batch(self, descriptions: List[str], amounts: Optional[List[float]] = None) -> List[Dict]:
-        """Predict categories for multiple descriptions"""
-        results = []
+        """
+        Predict categories for multiple descriptions.
+        Scores the whole batch with array operations; results are the same as
+        calling predict() on each description. Repeated (description, amount)
+        pairs, e.g. the same merchant on a statement, are scored once.
+        """
+        amount_list = [amounts[i] if amounts and i < len(amounts) else None for i in range(len(descriptions))]
+        results: List[Optional[Dict]] = [None] * len(descriptions)
+        
+        # Row of each distinct normalized (description, amount) pair
+        unique_rows: Dict[Tuple[str, Optional[float]], int] = {}
+        row_of: List[Tuple[int, int]] = []
         for i, description in enumerate(descriptions):
-            amount = amounts[i] if amounts and i < len(amounts) else None
-            result = self.predict(description, amount)
-            results.append(result)
+            if not description or not description.strip():
+                results[i] = self.predict(description, amount_list[i])
+            else:
+                key = (description.strip().lower(), amount_list[i])
+                row_of.append((i, unique_rows.setdefault(key, len(unique_rows))))
+        if not row_of:
+            return results
+        
+        n, n_categories = len(unique_rows), self._n_categories
+        pattern_matches = np.zeros((n, n_categories), dtype=np.int16)
+        keyword_matches = np.zeros((n, n_categories), dtype=np.int16)
+        description_words = np.zeros((n, len(self._vocab)), dtype=np.float32)
+        unknown_words = np.zeros(n)
+        row_amounts = np.full(n, np.nan)
+        word_rows: List[int] = []
+        word_columns: List[int] = []
+        
+        for r, (description_lower, amount) in enumerate(unique_rows):
+            pattern_matches[r], keyword_matches[r] = self._score_all_categories(description_lower)
+            word_ids, unknown_words[r] = self._description_ids(description_lower)
+            word_rows.extend([r] * len(word_ids))
+            word_columns.extend(word_ids)
+            if amount is not None:
+                row_amounts[r] = amount
+        description_words[word_rows, word_columns] = 1
+        
+        # Pattern-based confidence (see _calculate_pattern_confidence)
+        keyword_boost = np.minimum(keyword_matches * 0.1, 0.3)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pattern_conf = np.where(self._pattern_totals > 0,
+                                    np.minimum(pattern_matches / self._pattern_totals + keyword_boost, 0.95), 0.1)
+        
+        # Similarity-based confidence: word-set Jaccard against every example at once.
+        # Counts come out of the float32 product; the ratios are taken in float64
+        intersection = (description_words @ self._example_matrix.T).astype(np.float64)
+        union = (description_words.sum(axis=1, dtype=np.float64) + unknown_words)[:, None] + self._example_sizes - intersection
+        jaccard = np.where(self._example_sizes > 0, intersection / np.maximum(union, 1), 0.0)
+        similarity_conf = np.zeros((n, n_categories))
+        for ci, columns in enumerate(self._example_columns):
+            if columns.size:
+                similarity_conf[:, ci] = np.maximum(jaccard[:, columns].max(axis=1), 0.0)
+        
+        # Rows with overwhelming pattern evidence ignore similarity, as in predict()
+        top_two = np.sort(pattern_conf, axis=1)[:, -2:]
+        skip_similarity = (top_two[:, 1] > self.SHORT_CIRCUIT_CONFIDENCE) & (top_two[:, 0] < self.SHORT_CIRCUIT_RUNNER_UP)
+        similarity_conf[skip_similarity] = 0.0
+        self.similarity_skips += int(skip_similarity.sum())
+        
+        scores = (pattern_conf * 0.7) + (similarity_conf * 0.3)
+        
+        # Amount-based adjustments (see _amount_factors)
+        has_amount = ~np.isnan(row_amounts)
+        if has_amount.any():
+            breakpoints = np.array(self._amount_breakpoints)
+            i = np.searchsorted(breakpoints, row_amounts, side='left')
+            on_breakpoint = breakpoints[np.minimum(i, len(breakpoints) - 1)] == row_amounts
+            multipliers = self._amount_region_table[2 * i + on_breakpoint]
+            adjusted = np.minimum(scores * multipliers, 0.95)
+            scores = np.where(has_amount[:, None], adjusted, scores)
+        
+        scores = np.maximum(scores, 0.05)  # Minimum confidence
+        
+        # Normalize scores to sum to 1.0 (summed left to right, like sum() in predict)
+        total = scores[:, 0].copy()
+        for ci in range(1, n_categories):
+            total += scores[:, ci]
+        normalized = scores / total[:, None]
+        
+        # Top 3 by descending score, ties kept in category order
+        order = np.argsort(-normalized, axis=1, kind='stable')[:, :3]
+        all_probabilities = normalized.tolist()
+        all_top = order.tolist()
+        
+        # Fresh dicts per input row, so duplicates don't share mutable results
+        for i, r in row_of:
+            probabilities = all_probabilities[r]
+            top = all_top[r]
+            top_confidence = probabilities[top[0]]
+            
+            # Boost confidence if it's a clear match
+            if top_confidence > 0.6:
+                top_confidence = min(top_confidence * 1.2, 0.95)
+            
+            results[i] = {
+                'category': self.categories[top[0]],
+                'confidence': top_confidence,
+                'all_probabilities': dict(zip(self.categories, probabilities)),
+                'suggested': [(self.categories[ci], probabilities[ci]) for ci in top]
+            }
         return results
 
     def get_categories(self) -> List[str]:
@@ -291,6 +723,7 @@ class ImprovedTransformerCategorizer:
         # For now, just log the correction
         # In a production system, this would update the model
         print(f"📝 Correction logged: '{description}' → {correct_category}")
+        self._predict_cached.cache_clear()
         
         # Could implement online learning here in the future
         pass
@@ -0,0 +1,132 @@
+# ml_model/onnx_categorizer.py
+"""
+ONNX Runtime categorizer for the exported (INT8 quantized) DistilBERT model.
+The model is exported and quantized once at build time by download_models.py.
+"""
+
+import os
+import json
+from typing import Dict, List, Optional
+
+import numpy as np
+import onnxruntime as ort
+from transformers import AutoTokenizer
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def _intra_op_threads() -> int:
+    if os.getenv('ORT_INTRA'):
+        return int(os.getenv('ORT_INTRA'))
+    # Hyperthread siblings only add contention for GEMM-bound inference
+    physical = psutil.cpu_count(logical=False) if psutil else None
+    return physical or os.cpu_count() or 1
+
+
+def _session_options(level: ort.GraphOptimizationLevel) -> ort.SessionOptions:
+    so = ort.SessionOptions()
+    so.intra_op_num_threads = _intra_op_threads()
+    so.inter_op_num_threads = 1
+    so.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    so.graph_optimization_level = level
+    return so
+
+
+def _save_optimized_model(model_path: str, optimized_path: str) -> None:
+    """
+    Serialize the hardware-independent (ORT_ENABLE_EXTENDED) optimizations of
+    model_path. Higher levels may bake in kernels for the CPU they ran on, and
+    the build host isn't necessarily the one serving the model.
+    """
+    # Written aside and renamed, so a concurrent start never loads a partial file
+    temp_path = f"{os.path.splitext(optimized_path)[0]}.{os.getpid()}.onnx"
+    so = _session_options(ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED)
+    so.optimized_model_filepath = temp_path
+    ort.InferenceSession(model_path, sess_options=so, providers=["CPUExecutionProvider"])
+    os.replace(temp_path, optimized_path)
+
+
+def create_session(model_path: str) -> ort.InferenceSession:
+    """
+    Create a CPU inference session. The offline optimization pass is saved
+    next to the model as ``*.opt.onnx`` (redone whenever the model file is
+    newer) and later calls load that file; the hardware-specific layout
+    optimizations then run online, on the host that serves the model.
+    """
+    optimized_path = os.path.splitext(model_path)[0] + '.opt.onnx'
+    if not os.path.exists(optimized_path) or os.path.getmtime(optimized_path) < os.path.getmtime(model_path):
+        _save_optimized_model(model_path, optimized_path)
+
+    so = _session_options(ort.GraphOptimizationLevel.ORT_ENABLE_ALL)
+    return ort.InferenceSession(optimized_path, sess_options=so, providers=["CPUExecutionProvider"])
+
+
+class OnnxCategorizer:
+    def __init__(self, model_path: str = "models/expense_distilbert_onnx/model_int8.onnx"):
+        self.model_path = model_path
+        self.model_dir = os.path.dirname(model_path)
+        self._load()
+
+    def _load(self):
+        config_file = os.path.join(self.model_dir, 'config.json')
+        if not os.path.exists(self.model_path) or not os.path.exists(config_file):
+            raise FileNotFoundError("ONNX model or config.json missing in " + self.model_dir)
+        with open(config_file, 'r') as f:
+            id2label = json.load(f)['id2label']
+        self.labels = [id2label[str(i)] for i in range(len(id2label))]
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir, use_fast=True)
+
+        self.session = create_session(self.model_path)
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def _format_text(self, merchant_name: str, description: str, amount: float) -> str:
+        # Same arguments and layout as TransformerCategorizer._format_text, which
+        # produced the text the model was fine-tuned on
+        text = (merchant_name or '') + ' - ' + (description or '')
+        return text + ' [AMT] ' + str(amount)
+
+    def predict(self, description: str, amount: Optional[float] = None, merchant_name: str = '') -> Dict:
+        return self.predict_batch([description], [amount], merchant_names=[merchant_name])[0]
+
+    def predict_batch(self, descriptions: List[str], amounts: Optional[List[float]] = None, topk: int = 3,
+                      merchant_names: Optional[List[str]] = None) -> List[Dict]:
+        if not descriptions:
+            return []
+        texts = [
+            self._format_text(
+                merchant_names[i] if merchant_names and i < len(merchant_names) else '',
+                description,
+                (amounts[i] if amounts and i < len(amounts) else None) or 0.0
+            )
+            for i, description in enumerate(descriptions)
+        ]
+        enc = self.tokenizer(texts, truncation=True, padding=True, max_length=128, return_tensors='np')
+        feed = {name: enc[name].astype(np.int64) for name in self.input_names}
+        logits = self.session.run(None, feed)[0]
+
+        # Softmax in place on the session's output buffer
+        probs = logits
+        probs -= probs.max(axis=1, keepdims=True)
+        np.exp(probs, out=probs)
+        probs /= probs.sum(axis=1, keepdims=True)
+
+        results = []
+        for row in probs:
+            order = np.argsort(row)[::-1]
+            results.append({
+                'category': self.labels[order[0]],
+                'confidence': float(row[order[0]]),
+                'suggested': [(self.labels[i], float(row[i])) for i in order[:topk]],
+                'all_probabilities': {self.labels[i]: float(row[i]) for i in range(len(row))}
+            })
+        return results
+
+    def get_categories(self) -> List[str]:
+        return list(self.labels)
+
+    def add_correction(self, description: str, correct_category: str, amount: Optional[float] = None):
+        # The exported graph is frozen; corrections are only collected in data/corrections.csv
+        pass
@@ -7,13 +7,61 @@ Uses advanced pattern matching and rule-based logic for 95%+ accuracy
 import json
 import os
 import re
-from typing import Dict, List, Tuple, Optional
+import functools
+import operator
+import threading
+from typing import Any, Callable, ClassVar, Dict, List, Tuple, Optional
 import unicodedata
 
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Special characters and whitespace: [^\w\s] and \s together are exactly \W
+_NON_WORD_RE = re.compile(r'\W+')
+
+class _KeywordIndex:
+    """Keyword tables of one perfect_keywords state, replaced as a whole on rebuild"""
+    __slots__ = ('entries', 'category_words', 'word_proximity', 'prefixes', 'short_keywords', 'automaton')
+    
+    def __init__(self, entries: List[Tuple[str, Tuple[Tuple[str, int, float], ...]]],
+                 category_words: Dict[str, Tuple[str, ...]],
+                 word_proximity: Callable[[str], Tuple[Tuple[float, ...], ...]],
+                 prefixes: Dict[str, List[int]], short_keywords: List[int], automaton: Any) -> None:
+        self.entries = entries
+        self.category_words = category_words
+        self.word_proximity = word_proximity
+        self.prefixes = prefixes
+        self.short_keywords = short_keywords
+        self.automaton = automaton
+
 class PerfectExpenseCategorizer:
+    # Typical amount range of each category: (min, max, boost)
+    AMOUNT_RANGES: ClassVar[Dict[str, Tuple[float, float, float]]] = {
+        'Food & Dining': (5, 500, 0.1),
+        'Transportation': (10, 1000, 0.08),
+        'Shopping': (20, 2000, 0.08),
+        'Entertainment': (10, 300, 0.08),
+        'Technology': (100, 5000, 0.12),
+        'Bills & Utilities': (50, 2000, 0.1),
+        'Healthcare': (20, 1000, 0.08),
+        'Travel': (100, 3000, 0.1),
+        'Education': (50, 5000, 0.08),
+        'Business': (25, 1000, 0.08),
+        'Other': (1, 10000, 0.02)
+    }
+    
+    # Fixed attribute layout: no per-instance __dict__ on the scoring hot path
+    __slots__ = (
+        'model_path', 'categories', '_amount_ranges', 'perfect_keywords', 'advanced_patterns',
+        '_compiled_patterns', 'context_rules', '_predict_cached', '_keyword_index', '_learn_lock'
+    )
+    
     def __init__(self, model_path: str = "models/perfect_categorizer"):
         self.model_path = model_path
-        self.categories = [
+        self.categories = (
             'Food & Dining',
             'Transportation', 
             'Shopping',
@@ -25,17 +73,30 @@ class PerfectExpenseCategorizer:
             'Education',
             'Business',
             'Other'
-        ]
+        )
+        # Amount ranges in category order
+        self._amount_ranges = tuple(self.AMOUNT_RANGES.get(category) for category in self.categories)
         
         # High-confidence keyword mappings
         self.perfect_keywords = self._load_perfect_keywords()
+        self._build_keyword_index()
+        # Serializes corrections; predictions never take it
+        self._learn_lock = threading.Lock()
         
-        # Advanced pattern rules
+        # Advanced pattern rules, compiled once. Each pattern that matches adds to
+        # the score, so they are kept separate rather than joined into one alternation
         self.advanced_patterns = self._load_advanced_patterns()
+        self._compiled_patterns = {
+            category: [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+            for category, patterns in self.advanced_patterns.items()
+        }
         
         # Context-based rules
         self.context_rules = self._load_context_rules()
         
+        # Same merchants come back again and again; memoize per instance
+        self._predict_cached = functools.lru_cache(maxsize=8192)(self._predict_core)
+        
         print(f"🎯 Perfect categorizer loaded with {len(self.categories)} categories")
         print(f"🧠 Using advanced pattern matching for 95%+ confidence")
 
@@ -278,11 +339,22 @@ class PerfectExpenseCategorizer:
         # Normalize description
         desc_clean = self._clean_description(description)
         
+        # Keyed on the exact amount: the amount-range boosts and context rules
+        # have hard thresholds that a bucketed amount would blur
+        top_category, top_confidence, probabilities, suggested = self._predict_cached(desc_clean, amount)
+        return {
+            'category': top_category,
+            'confidence': top_confidence,
+            'all_probabilities': dict(probabilities),
+            'suggested': list(suggested)
+        }
+
+    def _predict_core(self, desc_clean: str, amount: Optional[float]) -> Tuple:
+        """Score a cleaned description; returns immutable parts of the result for caching"""
         # Calculate scores for each category
         category_scores = {}
         
-        for category in self.categories:
-            score = self._calculate_perfect_score(desc_clean, category, amount)
+        for category, score in self._calculate_perfect_scores(desc_clean, amount).items():
             category_scores[category] = max(score, 0.01)  # Minimum score
         
         # Apply context rules
@@ -295,84 +367,155 @@ class PerfectExpenseCategorizer:
         else:
             normalized_scores = {cat: 1.0/len(self.categories) for cat in self.categories}
         
-        # Get top prediction
-        top_category = max(normalized_scores, key=normalized_scores.get)
-        top_confidence = normalized_scores[top_category]
+        # Suggested categories (top 3); the first one is the prediction. A stable
+        # sort of 11 items beats heapq.nlargest and keeps max()'s tie order
+        suggested = sorted(normalized_scores.items(), key=operator.itemgetter(1), reverse=True)[:3]
+        top_category, top_confidence = suggested[0]
         
         # Boost confidence for high-quality matches
         if top_confidence > 0.4:
             top_confidence = min(top_confidence * 1.5, 0.98)  # Up to 98% confidence
         
-        # Create suggested categories (top 3)
-        sorted_categories = sorted(normalized_scores.items(), key=lambda x: x[1], reverse=True)
-        suggested = sorted_categories[:3]
-        
-        return {
-            'category': top_category,
-            'confidence': top_confidence,
-            'all_probabilities': normalized_scores,
-            'suggested': suggested
-        }
+        return top_category, top_confidence, tuple(normalized_scores.items()), tuple(suggested)
 
     def _clean_description(self, description: str) -> str:
         """Clean and normalize description for better matching"""
-        # Convert to lowercase
-        desc = description.lower().strip()
-        
-        # Remove special characters but keep spaces and alphanumeric
-        desc = re.sub(r'[^\w\s]', ' ', desc)
-        
-        # Remove extra whitespace
-        desc = re.sub(r'\s+', ' ', desc)
+        # Lowercase, then collapse every run of special characters and
+        # whitespace into a single space
+        desc = _NON_WORD_RE.sub(' ', description.lower().strip())
         
-        # Normalize unicode characters
-        desc = unicodedata.normalize('NFKD', desc)
+        # Normalize unicode characters (a no-op for plain ASCII)
+        if not desc.isascii():
+            desc = unicodedata.normalize('NFKD', desc)
         
         return desc
 
-    def _calculate_perfect_score(self, description: str, category: str, amount: Optional[float]) -> float:
-        """Calculate perfect score using multiple matching techniques"""
-        score = 0.0
-        
-        # 1. Exact keyword matching (highest weight)
-        keywords = self.perfect_keywords.get(category, [])
-        keyword_matches = 0
-        total_keywords = len(keywords)
-        
-        for keyword in keywords:
-            if keyword in description:
-                keyword_matches += 1
+    def _build_keyword_index(self) -> None:
+        """
+        Map each distinct keyword to the (category, position, weight) entries it
+        scores for, and load them into an Aho-Corasick automaton when available.
+        Rebuilt whenever perfect_keywords changes; the tables are built aside and
+        published with one assignment, so a concurrent prediction never sees a mix
+        """
+        entries: Dict[str, List[Tuple[str, int, float]]] = {}
+        for category, keywords in self.perfect_keywords.items():
+            for position, keyword in enumerate(keywords):
                 # Boost score for exact brand/service matches
                 if len(keyword) > 3 and keyword in ['starbucks', 'amazon', 'uber', 'netflix']:
-                    score += 0.4
+                    weight = 0.4
                 else:
-                    score += 0.2
+                    weight = 0.2
+                entries.setdefault(keyword, []).append((category, position, weight))
+        keyword_entries = [(keyword, tuple(hits)) for keyword, hits in entries.items()]
         
-        # 2. Pattern matching (medium weight)
-        patterns = self.advanced_patterns.get(category, [])
-        for pattern in patterns:
-            if re.search(pattern, description, re.IGNORECASE):
-                score += 0.3
+        # Words of each category's keywords, in order and with repeats, for proximity scoring
+        category_words: Dict[str, Tuple[str, ...]] = {
+            category: tuple(word for keyword in keywords for word in keyword.split())
+            for category, keywords in self.perfect_keywords.items()
+        }
+        # Description words repeat across predictions; remember what each one adds
+        word_proximity = functools.lru_cache(maxsize=50000)(
+            functools.partial(self._scan_word_proximity, category_words)
+        )
         
-        # 3. Word proximity scoring (low weight)
-        desc_words = description.split()
-        category_words = [word for keyword in keywords for word in keyword.split()]
+        # Without the automaton, only test keywords whose first three characters
+        # occur in the description (shorter keywords are always tested)
+        keyword_prefixes: Dict[str, List[int]] = {}
+        short_keywords: List[int] = []
+        for i, (keyword, _) in enumerate(keyword_entries):
+            if len(keyword) < 3:
+                short_keywords.append(i)
+            else:
+                keyword_prefixes.setdefault(keyword[:3], []).append(i)
         
-        proximity_score = 0
-        for desc_word in desc_words:
-            for cat_word in category_words:
-                if desc_word == cat_word:
-                    proximity_score += 0.1
-                elif self._similar_words(desc_word, cat_word):
-                    proximity_score += 0.05
+        keyword_automaton = None
+        if AHOCORASICK_AVAILABLE:
+            keyword_automaton = ahocorasick.Automaton()
+            for keyword, hits in keyword_entries:
+                keyword_automaton.add_word(keyword, hits)
+            keyword_automaton.make_automaton()
+        
+        self._keyword_index = _KeywordIndex(
+            keyword_entries, category_words, word_proximity, keyword_prefixes, short_keywords, keyword_automaton
+        )
+
+    def _calculate_keyword_scores(self, description: str, index: _KeywordIndex) -> Dict[str, float]:
+        """Exact keyword matching score of every category from one pass over the description"""
+        if index.automaton is not None:
+            found = {hits for _, hits in index.automaton.iter(description)}
+        else:
+            candidates = set(index.short_keywords)
+            for i in range(len(description) - 2):
+                candidates.update(index.prefixes.get(description[i:i + 3], ()))
+            found = {index.entries[i][1] for i in candidates if index.entries[i][0] in description}
+        
+        matched: Dict[str, List[Tuple[int, float]]] = {}
+        for hits in found:
+            for category, position, weight in hits:
+                matched.setdefault(category, []).append((position, weight))
         
-        score += min(proximity_score, 0.3)
+        # Summed in keyword-list order, like the original per-category scan
+        keyword_scores = {}
+        for category, hits in matched.items():
+            score = 0.0
+            for _, weight in sorted(hits):
+                score += weight
+            keyword_scores[category] = score
+        return keyword_scores
+
+    def _calculate_perfect_scores(self, description: str, amount: Optional[float]) -> Dict[str, float]:
+        """
+        Calculate the perfect score of every category using multiple matching
+        techniques; the description is matched and tokenized once for all of them
+        """
+        # 1. Exact keyword matching (highest weight), from one snapshot of the keyword tables
+        index = self._keyword_index
+        keyword_scores = self._calculate_keyword_scores(description, index)
+        word_increments = [index.word_proximity(desc_word) for desc_word in description.split()]
+        amount_scores = self._calculate_amount_scores(amount) if amount is not None else None
         
-        # 4. Amount-based adjustments
-        if amount is not None:
-            score += self._calculate_amount_score(category, amount)
+        scores = {}
+        for ci, category in enumerate(self.categories):
+            score = keyword_scores.get(category, 0.0)
+            
+            # 2. Pattern matching (medium weight)
+            patterns = self._compiled_patterns.get(category, [])
+            for pattern in patterns:
+                if pattern.search(description):
+                    score += 0.3
+            
+            # 3. Word proximity scoring (low weight), added in the same order as
+            # scanning every description word against every category word
+            proximity_score = 0.0
+            for increments in word_increments:
+                for increment in increments[ci]:
+                    proximity_score += increment
+            
+            score += min(proximity_score, 0.3)
+            
+            # 4. Amount-based adjustments
+            if amount_scores is not None:
+                score += amount_scores[ci]
+            
+            scores[category] = min(score, 1.0)
         
-        return min(score, 1.0)
+        return scores
+
+    def _scan_word_proximity(self, category_words: Dict[str, Tuple[str, ...]], desc_word: str) -> Tuple[Tuple[float, ...], ...]:
+        """
+        Proximity increments one description word earns in each category, in
+        category word order: 0.1 per equal word, 0.05 per similar word
+        """
+        increments = []
+        for category in self.categories:
+            category_increments = []
+            for cat_word in category_words.get(category, ()):
+                if desc_word == cat_word:
+                    category_increments.append(0.1)
+                elif self._similar_words(desc_word, cat_word):
+                    category_increments.append(0.05)
+            increments.append(tuple(category_increments))
+        return tuple(increments)
 
     def _similar_words(self, word1: str, word2: str) -> bool:
         """Check if two words are similar (simple implementation)"""
@@ -382,32 +525,21 @@ class PerfectExpenseCategorizer:
         # Check if one word is contained in another
         return word1 in word2 or word2 in word1
 
-    def _calculate_amount_score(self, category: str, amount: float) -> float:
-        """Calculate score boost based on typical amount ranges"""
-        amount_ranges = {
-            'Food & Dining': (5, 500, 0.1),
-            'Transportation': (10, 1000, 0.08),
-            'Shopping': (20, 2000, 0.08),
-            'Entertainment': (10, 300, 0.08),
-            'Technology': (100, 5000, 0.12),
-            'Bills & Utilities': (50, 2000, 0.1),
-            'Healthcare': (20, 1000, 0.08),
-            'Travel': (100, 3000, 0.1),
-            'Education': (50, 5000, 0.08),
-            'Business': (25, 1000, 0.08),
-            'Other': (1, 10000, 0.02)
-        }
-        
-        if category in amount_ranges:
-            min_amt, max_amt, boost = amount_ranges[category]
-            if min_amt <= amount <= max_amt:
-                return boost
-            elif amount > max_amt * 3:  # Very high amount
-                return -0.05
-            elif amount < min_amt * 0.3:  # Very low amount
-                return -0.03
-        
-        return 0.0
+    def _calculate_amount_scores(self, amount: float) -> List[float]:
+        """Score boost of every category based on typical amount ranges"""
+        scores = []
+        for amount_range in self._amount_ranges:
+            score = 0.0
+            if amount_range is not None:
+                min_amt, max_amt, boost = amount_range
+                if min_amt <= amount <= max_amt:
+                    score = boost
+                elif amount > max_amt * 3:  # Very high amount
+                    score = -0.05
+                elif amount < min_amt * 0.3:  # Very low amount
+                    score = -0.03
+            scores.append(score)
+        return scores
 
     def _apply_context_rules(self, description: str, amount: Optional[float], scores: Dict[str, float]) -> Dict[str, float]:
         """Apply context-based rules to improve scoring"""
@@ -422,18 +554,40 @@ class PerfectExpenseCategorizer:
         
         return scores
 
-    def predict_batch(self, descriptions: List[str], amounts: Optional[List[float]] = None) -> List[Dict]:
-        """Predict categories for multiple descriptions"""
-        results = []
+    def predict_batch(self, descriptions: List[str], amounts: Optional[List[Optional[float]]] = None) -> List[Dict]:
+        """
+        Predict categories for multiple descriptions. Rows are cleaned once and
+        every distinct (description, amount) pair is scored only once
+        """
+        unique_rows: Dict[Tuple[str, Optional[float]], Tuple] = {}
+        row_keys: List[Optional[Tuple[str, Optional[float]]]] = []
         for i, description in enumerate(descriptions):
+            if not description or not description.strip():
+                row_keys.append(None)
+                continue
             amount = amounts[i] if amounts and i < len(amounts) else None
-            result = self.predict(description, amount)
-            results.append(result)
+            key = (self._clean_description(description), amount)
+            if key not in unique_rows:
+                unique_rows[key] = self._predict_cached(*key)
+            row_keys.append(key)
+        
+        results = []
+        for row_key in row_keys:
+            if row_key is None:
+                results.append(self.predict(''))
+                continue
+            top_category, top_confidence, probabilities, suggested = unique_rows[row_key]
+            results.append({
+                'category': top_category,
+                'confidence': top_confidence,
+                'all_probabilities': dict(probabilities),
+                'suggested': list(suggested)
+            })
         return results
 
     def get_categories(self) -> List[str]:
         """Get all available categories"""
-        return self.categories.copy()
+        return list(self.categories)
 
     def add_correction(self, description: str, correct_category: str, amount: Optional[float] = None):
         """Add a correction to improve future predictions"""
@@ -445,15 +599,20 @@ class PerfectExpenseCategorizer:
         
         # Add significant keywords to the category's keyword list
         if correct_category in self.perfect_keywords:
-            for keyword in keywords:
-                if len(keyword) > 3 and keyword not in self.perfect_keywords[correct_category]:
-                    # Add only if it's not already in other categories
-                    unique_to_category = True
-                    for other_cat, other_keywords in self.perfect_keywords.items():
-                        if other_cat != correct_category and keyword in other_keywords:
-                            unique_to_category = False
-                            break
-                    
-                    if unique_to_category:
-                        self.perfect_keywords[correct_category].append(keyword)
-                        print(f"🎓 Learned new keyword: '{keyword}' for {correct_category}")
+            with self._learn_lock:
+                for keyword in keywords:
+                    if len(keyword) > 3 and keyword not in self.perfect_keywords[correct_category]:
+                        # Add only if it's not already in other categories
+                        unique_to_category = True
+                        for other_cat, other_keywords in self.perfect_keywords.items():
+                            if other_cat != correct_category and keyword in other_keywords:
+                                unique_to_category = False
+                                break
+                        
+                        if unique_to_category:
+                            self.perfect_keywords[correct_category].append(keyword)
+                            print(f"🎓 Learned new keyword: '{keyword}' for {correct_category}")
+                
+                self._build_keyword_index()
+            # Cleared only once the new tables are published
+            self._predict_cached.cache_clear()
@@ -4,15 +4,358 @@ Ultra-Perfect Expense Categorizer
 Achieves 98%+ confidence with massive training data and advanced AI techniques
 """
 
-import json
-import os
 import re
-from typing import Dict, List, Tuple, Optional
+import sys
+import functools
+import logging
+import operator
+import threading
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Set, Tuple, Optional
 import unicodedata
-from collections import defaultdict
-import math
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# A run of separators (punctuation and whitespace) between two tokens
+_NON_WORD_RE = re.compile(r'\W+')
+
+# Common prefixes/suffixes that don't add meaning
+_FILLER_WORDS_RE = re.compile(r'\b(payment|charge|purchase|order|transaction|invoice|bill)\b')
+
+# Brand variations, applied in this order
+_BRAND_NORMALIZATIONS = (
+    ('mcdonald', 'mcdonalds'),
+    ('mc donald', 'mcdonalds'),
+    ('mac donald', 'mcdonalds'),
+    ('star buck', 'starbucks'),
+    ('star bucks', 'starbucks'),
+    ('dunkin donut', 'dunkin'),
+    ('dunking donut', 'dunkin'),
+    ('amazon.com', 'amazon'),
+    ('walmart.com', 'walmart'),
+    ('target.com', 'target'),
+)
+_BRAND_VARIANT_RE = re.compile('|'.join(re.escape(variant) for variant, _ in _BRAND_NORMALIZATIONS))
+
+
+def _is_word_boundary(text: str, i: int) -> bool:
+    """Whether the regex \\b holds at position i of text (\\w is alphanumeric or '_')"""
+    before = i > 0 and (text[i - 1].isalnum() or text[i - 1] == '_')
+    after = i < len(text) and (text[i].isalnum() or text[i] == '_')
+    return before != after
+
+
+def _contains_word(text: str, word: str) -> bool:
+    """
+    Same as re.search(r'\\b' + re.escape(word) + r'\\b', text), without
+    compiling a pattern per word: some occurrence of word is bounded on both sides
+    """
+    start = text.find(word)
+    while start != -1:
+        if _is_word_boundary(text, start) and _is_word_boundary(text, start + len(word)):
+            return True
+        start = text.find(word, start + 1)
+    return False
+
+# Airline keywords listed under both Transportation and Travel
+_COMMON_AIRLINES = (
+    'airline', 'flight', 'airplane', 'plane', 'air travel', 'aviation', 'airport',
+    'american airlines', 'delta', 'united', 'southwest', 'jetblue', 'alaska', 'frontier',
+    'spirit', 'allegiant', 'hawaiian',
+)
+
+
+class _SubstringIndex:
+    """
+    Finds which of a fixed list of strings occur in a text: in one
+    Aho-Corasick pass when pyahocorasick is installed, otherwise by testing
+    only the strings whose first three characters occur in the text
+    (shorter strings are always tested)
+    """
+
+    __slots__ = ('words', '_automaton', '_prefixes', '_short')
+
+    def __init__(self, words: Iterable[str]):
+        self.words = tuple(words)
+        
+        self._prefixes: Dict[str, List[int]] = {}
+        self._short: List[int] = []
+        for i, word in enumerate(self.words):
+            if len(word) < 3:
+                self._short.append(i)
+            else:
+                self._prefixes.setdefault(word[:3], []).append(i)
+        
+        self._automaton = None
+        if AHOCORASICK_AVAILABLE:
+            automaton = ahocorasick.Automaton()
+            for i, word in enumerate(self.words):
+                automaton.add_word(word, i)
+            automaton.make_automaton()
+            self._automaton = automaton
+
+    def find(self, text: str) -> Set[int]:
+        """Indices into words of every string occurring in text"""
+        if self._automaton is not None:
+            return {i for _, i in self._automaton.iter(text)}
+        candidates = set(self._short)
+        for i in range(len(text) - 2):
+            candidates.update(self._prefixes.get(text[i:i + 3], ()))
+        return {i for i in candidates if self.words[i] in text}
+
 
 class UltraPerfectExpenseCategorizer:
+    # Priority keywords for terms that should override other categories
+    PRIORITY_KEYWORDS = {
+        'Transportation': (
+            'bus', 'auto', 'taxi', 'cab', 'rickshaw', 'uber', 'lyft', 'train', 'metro', 'flight',
+            'gas', 'petrol', 'fuel', 'diesel', 'parking', 'toll', 'fare', 'ride', 'transport',
+            'car', 'bike', 'scooter', 'motorcycle', 'vehicle', 'drive', 'driving'
+        ),
+        'Technology': (
+            'phone', 'mobile', 'smartphone', 'iphone', 'android', 'laptop', 'computer', 'tablet',
+            'ipad', 'software', 'app', 'internet', 'wifi', 'data', 'tech', 'electronic'
+        ),
+        'Healthcare': (
+            'doctor', 'hospital', 'medical', 'medicine', 'pharmacy', 'health', 'clinic',
+            'dental', 'dentist', 'prescription', 'tablet', 'syrup', 'injection'
+        ),
+        'Entertainment': (
+            'movie', 'cinema', 'theater', 'netflix', 'spotify', 'game', 'gaming', 'music',
+            'concert', 'show', 'gym', 'sport', 'cricket', 'football'
+        ),
+        'Bills & Utilities': (
+            'electricity', 'electric', 'water', 'gas', 'internet', 'phone', 'mobile',
+            'bill', 'utility', 'insurance', 'rent', 'emi', 'loan'
+        ),
+    }
+
+    # Strong category indicators (common daily terms) for confidence boosting
+    STRONG_INDICATORS = {
+        'Food & Dining': (
+            'chicken', 'food', 'restaurant', 'grocery', 'eat', 'meal', 'dining', 'lunch', 'dinner', 'breakfast',
+            'coffee', 'tea', 'pizza', 'burger', 'sandwich', 'rice', 'bread', 'milk', 'meat', 'fish', 'vegetable',
+            'fruit', 'snack', 'drink', 'juice', 'water', 'beer', 'wine', 'cafe', 'kitchen', 'cook', 'cooking',
+            'order', 'delivery', 'takeout', 'buffet', 'menu', 'dish', 'curry', 'soup', 'salad', 'pasta'
+        ),
+        'Transportation': (
+            'gas', 'fuel', 'uber', 'lyft', 'taxi', 'car', 'bus', 'train', 'ride', 'auto', 'rickshaw', 'metro',
+            'subway', 'transport', 'travel', 'drive', 'driving', 'parking', 'toll', 'petrol', 'diesel',
+            'vehicle', 'bike', 'bicycle', 'motorcycle', 'scooter', 'flight', 'plane', 'airline', 'airport',
+            'station', 'stop', 'journey', 'trip', 'commute', 'pickup', 'drop', 'fare', 'ticket'
+        ),
+        'Shopping': (
+            'shop', 'shopping', 'store', 'buy', 'purchase', 'amazon', 'walmart', 'target', 'mall', 'market',
+            'clothes', 'shirt', 'pants', 'shoes', 'dress', 'bag', 'phone', 'laptop', 'book', 'pen', 'paper',
+            'grocery', 'supermarket', 'retail', 'sale', 'discount', 'offer', 'deal', 'cart', 'checkout',
+            'order', 'online', 'delivery', 'item', 'product', 'goods', 'merchandise', 'clothing', 'apparel'
+        ),
+        'Entertainment': (
+            'movie', 'theater', 'cinema', 'netflix', 'spotify', 'gym', 'game', 'gaming', 'music', 'concert',
+            'show', 'entertainment', 'fun', 'play', 'sport', 'cricket', 'football', 'tennis', 'swimming',
+            'party', 'club', 'bar', 'pub', 'dance', 'festival', 'event', 'ticket', 'subscription', 'streaming',
+            'youtube', 'video', 'tv', 'television', 'radio', 'podcast', 'book', 'reading', 'hobby'
+        ),
+        'Technology': (
+            'apple', 'samsung', 'computer', 'phone', 'iphone', 'laptop', 'tech', 'software', 'app', 'internet',
+            'wifi', 'data', 'mobile', 'smartphone', 'tablet', 'ipad', 'android', 'windows', 'mac', 'google',
+            'microsoft', 'adobe', 'subscription', 'license', 'cloud', 'storage', 'backup', 'antivirus',
+            'camera', 'headphones', 'speaker', 'charger', 'cable', 'bluetooth', 'electronic', 'digital'
+        ),
+        'Bills & Utilities': (
+            'bill', 'electric', 'electricity', 'gas', 'water', 'internet', 'phone', 'insurance', 'rent',
+            'utility', 'payment', 'monthly', 'recurring', 'service', 'maintenance', 'repair', 'cable',
+            'broadband', 'wifi', 'landline', 'mobile', 'postpaid', 'prepaid', 'recharge', 'top-up',
+            'bank', 'loan', 'emi', 'credit', 'debit', 'fee', 'charge', 'tax', 'fine', 'penalty'
+        ),
+        'Healthcare': (
+            'doctor', 'hospital', 'medical', 'pharmacy', 'health', 'dental', 'medicine', 'tablet', 'syrup',
+            'injection', 'vaccine', 'checkup', 'consultation', 'treatment', 'therapy', 'surgery', 'test',
+            'scan', 'xray', 'blood', 'urine', 'prescription', 'drug', 'clinic', 'nursing', 'ambulance',
+            'emergency', 'first-aid', 'wellness', 'fitness', 'yoga', 'meditation', 'counseling'
+        ),
+        'Travel': (
+            'hotel', 'flight', 'travel', 'vacation', 'trip', 'airline', 'booking', 'ticket', 'tour', 'holiday',
+            'resort', 'accommodation', 'stay', 'room', 'suite', 'lodge', 'guest', 'check-in', 'checkout',
+            'luggage', 'baggage', 'passport', 'visa', 'customs', 'immigration', 'departure', 'arrival',
+            'journey', 'destination', 'sightseeing', 'cruise', 'safari', 'adventure', 'excursion'
+        ),
+        'Education': (
+            'school', 'college', 'university', 'education', 'course', 'book', 'study', 'learning', 'class',
+            'teacher', 'student', 'tuition', 'fees', 'admission', 'exam', 'test', 'assignment', 'project',
+            'homework', 'notebook', 'pen', 'pencil', 'stationery', 'library', 'research', 'degree',
+            'diploma', 'certificate', 'training', 'workshop', 'seminar', 'lecture', 'tutorial'
+        ),
+        'Business': (
+            'office', 'business', 'professional', 'consulting', 'supplies', 'meeting', 'conference', 'client',
+            'customer', 'project', 'work', 'job', 'career', 'salary', 'bonus', 'commission', 'expense',
+            'report', 'presentation', 'document', 'file', 'printer', 'computer', 'software', 'license',
+            'marketing', 'advertising', 'promotion', 'brand', 'company', 'corporate', 'enterprise'
+        )
+    }
+
+    # Very common daily terms that force high confidence for their category
+    DAILY_TERMS_BOOST = {
+        # Food terms
+        'chicken': ('Food & Dining', 0.92),
+        'chicken curry': ('Food & Dining', 0.92),
+        'food': ('Food & Dining', 0.88),
+        'coffee': ('Food & Dining', 0.88),
+        'lunch': ('Food & Dining', 0.88),
+        'dinner': ('Food & Dining', 0.88),
+        'grocery': ('Food & Dining', 0.88),
+        
+        # Transportation terms (enhanced)
+        'bus': ('Transportation', 0.92),
+        'bus fare': ('Transportation', 0.92),
+        'bus ticket': ('Transportation', 0.92),
+        'auto': ('Transportation', 0.92),
+        'auto rickshaw': ('Transportation', 0.92),
+        'autorickshaw': ('Transportation', 0.92),
+        'auto-rickshaw': ('Transportation', 0.92),
+        'rickshaw': ('Transportation', 0.92),
+        'taxi': ('Transportation', 0.90),
+        'cab': ('Transportation', 0.90),
+        'gas': ('Transportation', 0.88),
+        'petrol': ('Transportation', 0.88),
+        'fuel': ('Transportation', 0.88),
+        'train': ('Transportation', 0.90),
+        'metro': ('Transportation', 0.90),
+        'travel': ('Transportation', 0.88),
+        'transport': ('Transportation', 0.88),
+        
+        # Other categories
+        'movie': ('Entertainment', 0.88),
+        'doctor': ('Healthcare', 0.88),
+        'medicine': ('Healthcare', 0.88),
+        'shopping': ('Shopping', 0.88),
+        'phone': ('Technology', 0.85),
+        'internet': ('Bills & Utilities', 0.85),
+        'electricity': ('Bills & Utilities', 0.85),
+        'water': ('Bills & Utilities', 0.85)
+    }
+
+    # Context-aware pattern analysis
+    CONTEXT_PATTERNS = {
+        'Food & Dining': (
+            (r'\b(eat|ate|food|meal|restaurant|cafe)\b', 0.3),
+            (r'\b(delivery|takeout|pickup)\b', 0.25),
+            (r'\b(breakfast|lunch|dinner|brunch|snack)\b', 0.2),
+        ),
+        'Transportation': (
+            (r'\b(ride|trip|travel|transport)\b', 0.3),
+            (r'\b(airport|station|terminal)\b', 0.25),
+            (r'\b(fuel|gas|parking|toll)\b', 0.2),
+        ),
+        'Shopping': (
+            (r'\b(buy|bought|purchase|order|shop)\b', 0.3),
+            (r'\b(store|mall|online|website)\b', 0.25),
+            (r'\b(sale|discount|deal|coupon)\b', 0.2),
+        ),
+        'Entertainment': (
+            (r'\b(watch|play|game|music|show)\b', 0.3),
+            (r'\b(ticket|event|concert|movie)\b', 0.25),
+            (r'\b(subscription|streaming|monthly)\b', 0.2),
+        ),
+    }
+
+    # Enhanced amount ranges with confidence modifiers
+    AMOUNT_INTELLIGENCE = {
+        'Food & Dining': {
+            'typical_range': (3, 150),
+            'confidence_peak': (8, 60),
+            'boost_factor': 0.15,
+            'penalty_factor': 0.08
+        },
+        'Transportation': {
+            'typical_range': (5, 500),
+            'confidence_peak': (15, 200),
+            'boost_factor': 0.12,
+            'penalty_factor': 0.06
+        },
+        'Shopping': {
+            'typical_range': (10, 2000),
+            'confidence_peak': (25, 500),
+            'boost_factor': 0.1,
+            'penalty_factor': 0.05
+        },
+        'Entertainment': {
+            'typical_range': (5, 300),
+            'confidence_peak': (10, 100),
+            'boost_factor': 0.12,
+            'penalty_factor': 0.06
+        },
+        'Technology': {
+            'typical_range': (50, 5000),
+            'confidence_peak': (200, 2000),
+            'boost_factor': 0.18,
+            'penalty_factor': 0.1
+        },
+        'Bills & Utilities': {
+            'typical_range': (25, 1000),
+            'confidence_peak': (50, 400),
+            'boost_factor': 0.15,
+            'penalty_factor': 0.08
+        },
+        'Healthcare': {
+            'typical_range': (20, 2000),
+            'confidence_peak': (50, 500),
+            'boost_factor': 0.12,
+            'penalty_factor': 0.06
+        },
+        'Travel': {
+            'typical_range': (100, 5000),
+            'confidence_peak': (300, 2000),
+            'boost_factor': 0.15,
+            'penalty_factor': 0.08
+        },
+        'Education': {
+            'typical_range': (25, 10000),
+            'confidence_peak': (100, 2000),
+            'boost_factor': 0.12,
+            'penalty_factor': 0.06
+        },
+        'Business': {
+            'typical_range': (20, 5000),
+            'confidence_peak': (50, 1000),
+            'boost_factor': 0.1,
+            'penalty_factor': 0.05
+        },
+    }
+
+    # Context-aware boosters
+    CONTEXT_BOOSTERS = (
+        # Location-based intelligence
+        {
+            'condition': lambda d, a: 'airport' in d,
+            'boosts': {'Travel': 0.25, 'Food & Dining': 0.15, 'Transportation': 0.2}
+        },
+        {
+            'condition': lambda d, a: 'online' in d or 'website' in d or '.com' in d,
+            'boosts': {'Shopping': 0.2, 'Entertainment': 0.15, 'Technology': 0.1}
+        },
+        # Time-based intelligence
+        {
+            'condition': lambda d, a: any(word in d for word in ['monthly', 'subscription', 'recurring']),
+            'boosts': {'Entertainment': 0.2, 'Bills & Utilities': 0.25, 'Technology': 0.15}
+        },
+        # Amount-based intelligence
+        {
+            'condition': lambda d, a: a and a > 500,
+            'boosts': {'Technology': 0.15, 'Travel': 0.12, 'Shopping': 0.1}
+        },
+        {
+            'condition': lambda d, a: a and a < 10,
+            'boosts': {'Food & Dining': 0.2, 'Transportation': 0.1}
+        },
+    )
+
     def __init__(self, model_path: str = "models/ultra_perfect_categorizer"):
         self.model_path = model_path
         self.categories = [
@@ -29,24 +372,41 @@ class UltraPerfectExpenseCategorizer:
             'Other'
         ]
         
-        # Ultra-comprehensive keyword database (10x larger)
-        self.ultra_keywords = self._load_ultra_keywords()
+        # Ultra-comprehensive keyword database (10x larger). The tables are
+        # built once per process and shared; only this dict is per instance,
+        # since corrections add keywords to it
+        self.ultra_keywords = dict(self._load_ultra_keywords())
+        self._build_keyword_index()
+        # Serializes corrections; predictions never take it
+        self._learn_lock = threading.Lock()
         
         # Advanced semantic patterns
         self.semantic_patterns = self._load_semantic_patterns()
+        self._semantic_regexes = self._compile_semantic_patterns()
+        self._context_regexes = self._compile_context_patterns()
         
         # Brand confidence boosters
         self.brand_confidence = self._load_brand_confidence()
+        self._brand_names, self._brand_categories, self._brand_confidences, self._brand_scores = self._pack_brand_table()
+        self._brand_index = self._build_brand_index()
+        
+        # Strong indicators and daily terms, found in one pass per prediction
+        self._term_index, self._strong_indicator_counts = self._build_term_index()
         
         # Machine learning-like scoring system
         self.ml_weights = self._load_ml_weights()
         
-        print(f"🚀 Ultra-Perfect categorizer loaded with {len(self.categories)} categories")
-        print(f"🧠 Using 10,000+ keywords and advanced AI patterns for 98%+ confidence")
+        # Recurring merchants skip scoring entirely
+        self._predict_cached = functools.lru_cache(maxsize=8192)(self._predict_core)
+        
+        logger.debug(f"🚀 Ultra-Perfect categorizer loaded with {len(self.categories)} categories")
+        logger.debug(f"🧠 Using 10,000+ keywords and advanced AI patterns for 98%+ confidence")
 
-    def _load_ultra_keywords(self) -> Dict[str, List[str]]:
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
+    def _load_ultra_keywords() -> Mapping[str, Tuple[str, ...]]:
         """Load massive keyword database with 10x more keywords"""
-        return {
+        keywords = {
             'Food & Dining': [
                 # Major restaurant chains (expanded)
                 'mcdonalds', 'burger king', 'subway', 'starbucks', 'kfc', 'taco bell', 'pizza hut',
@@ -96,9 +456,7 @@ class UltraPerfectExpenseCategorizer:
                 'light rail', 'streetcar', 'tram', 'trolley', 'ferry', 'boat', 'water taxi',
                 
                 # Airlines (comprehensive)
-                'airline', 'flight', 'airplane', 'plane', 'air travel', 'aviation', 'airport',
-                'american airlines', 'delta', 'united', 'southwest', 'jetblue', 'alaska', 'frontier',
-                'spirit', 'allegiant', 'hawaiian', 'virgin', 'british airways', 'lufthansa', 'emirates',
+                *_COMMON_AIRLINES, 'virgin', 'british airways', 'lufthansa', 'emirates',
                 'qatar', 'singapore airlines', 'cathay pacific', 'air france', 'klm', 'turkish airlines',
                 
                 # Fuel & automotive
@@ -252,9 +610,7 @@ class UltraPerfectExpenseCategorizer:
             
             'Travel': [
                 # Airlines (comprehensive)
-                'airline', 'flight', 'airplane', 'plane', 'air travel', 'aviation', 'airport',
-                'american airlines', 'delta', 'united', 'southwest', 'jetblue', 'alaska', 'frontier',
-                'spirit', 'allegiant', 'hawaiian', 'virgin atlantic', 'british airways', 'lufthansa',
+                *_COMMON_AIRLINES, 'virgin atlantic', 'british airways', 'lufthansa',
                 'emirates', 'qatar airways', 'singapore airlines', 'cathay pacific', 'air france',
                 
                 # Hotels & accommodation
@@ -328,10 +684,16 @@ class UltraPerfectExpenseCategorizer:
                 'membership', 'subscription', 'renewal', 'registration', 'application', 'processing'
             ]
         }
+        # Interned, so a keyword shared by several categories is one object
+        # with a cached hash in every table built from it
+        return MappingProxyType({category: tuple(sys.intern(word) for word in words)
+                                 for category, words in keywords.items()})
 
-    def _load_semantic_patterns(self) -> Dict[str, List[str]]:
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
+    def _load_semantic_patterns() -> Mapping[str, Tuple[str, ...]]:
         """Load advanced semantic patterns with context awareness"""
-        return {
+        patterns = {
             'Food & Dining': [
                 r'\b(restaurant|cafe|coffee|food|eat|dining|meal|lunch|dinner|breakfast)\b',
                 r'\b(starbucks|mcdonalds|pizza|burger|sandwich|delivery|takeout)\b',
@@ -413,10 +775,13 @@ class UltraPerfectExpenseCategorizer:
                 r'\b(website|domain|seo|social\s*media|email\s*marketing)\b'
             ]
         }
+        return MappingProxyType({category: tuple(regexes) for category, regexes in patterns.items()})
 
-    def _load_brand_confidence(self) -> Dict[str, Tuple[str, float]]:
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
+    def _load_brand_confidence() -> Mapping[str, Tuple[str, float]]:
         """Load brand-specific confidence boosters"""
-        return {
+        brands = {
             # Food & Dining brands (ultra-high confidence)
             'starbucks': ('Food & Dining', 0.98),
             'mcdonalds': ('Food & Dining', 0.98),
@@ -484,10 +849,13 @@ class UltraPerfectExpenseCategorizer:
             'expedia': ('Travel', 0.95),
             'booking': ('Travel', 0.95),
         }
+        return MappingProxyType(brands)
 
-    def _load_ml_weights(self) -> Dict[str, float]:
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
+    def _load_ml_weights() -> Mapping[str, float]:
         """Load machine learning-inspired weights for scoring"""
-        return {
+        weights = {
             'exact_brand_match': 0.6,      # Highest weight for exact brand matches
             'keyword_match': 0.25,         # High weight for keyword matches
             'pattern_match': 0.15,         # Medium weight for pattern matches
@@ -497,6 +865,7 @@ class UltraPerfectExpenseCategorizer:
             'confidence_floor': 0.15,      # Minimum confidence level
             'confidence_ceiling': 0.98,    # Maximum confidence level
         }
+        return MappingProxyType(weights)
 
     def predict(self, description: str, amount: Optional[float] = None) -> Dict:
         """Ultra-perfect prediction with 98%+ confidence using advanced AI techniques"""
@@ -511,12 +880,27 @@ class UltraPerfectExpenseCategorizer:
         # Normalize description with advanced preprocessing
         desc_clean = self._ultra_clean_description(description)
         
-        # Calculate ultra-precise scores for each category
-        category_scores = {}
+        # Keyed on the exact amount: the amount intelligence and boosters
+        # have hard thresholds that a bucketed amount would blur
+        top_category, top_confidence, probabilities, suggested = self._predict_cached(desc_clean, amount)
+        return {
+            'category': top_category,
+            'confidence': top_confidence,
+            'all_probabilities': dict(probabilities),
+            'suggested': list(suggested)
+        }
+
+    def _predict_core(self, desc_clean: str, amount: Optional[float]) -> Tuple:
+        """Score a cleaned description; returns immutable parts of the result for caching"""
+        # Brands in the description, found once for scoring and boosting
+        brand_hits = self._find_brands(desc_clean)
         
-        for category in self.categories:
-            score = self._calculate_ultra_score(desc_clean, category, amount)
-            category_scores[category] = max(score, self.ml_weights['confidence_floor'])
+        # Calculate ultra-precise scores for each category
+        confidence_floor = self.ml_weights['confidence_floor']
+        category_scores = {
+            category: max(score, confidence_floor)
+            for category, score in self._calculate_ultra_scores(desc_clean, amount, brand_hits).items()
+        }
         
         # Apply advanced AI scoring techniques
         category_scores = self._apply_ai_boosters(desc_clean, amount, category_scores)
@@ -528,87 +912,25 @@ class UltraPerfectExpenseCategorizer:
         else:
             normalized_scores = {cat: 1.0/len(self.categories) for cat in self.categories}
         
+        # Create ultra-precise suggested categories; the top prediction is the
+        # first of them (the stable sort keeps max()'s choice among ties)
+        suggested = sorted(normalized_scores.items(), key=operator.itemgetter(1), reverse=True)[:3]
+        
         # Get top prediction with ultra-high confidence
-        top_category = max(normalized_scores, key=normalized_scores.get)
-        top_confidence = normalized_scores[top_category]
+        top_category, top_confidence = suggested[0]
+        
+        # Strong indicators and daily terms (and their words) in the description
+        found_terms = {self._term_index.words[i] for i in self._term_index.find(desc_clean)}
         
         # Apply ultra-confidence boosting
         if top_confidence > 0.08:  # Very low threshold for boosting
             # Check for brand matches first
-            brand_detected = any(brand in desc_clean for brand in self.brand_confidence.keys())
+            brand_detected = bool(brand_hits)
             
             # Check for strong category indicators (common daily terms)
-            strong_indicators = {
-                'Food & Dining': [
-                    'chicken', 'food', 'restaurant', 'grocery', 'eat', 'meal', 'dining', 'lunch', 'dinner', 'breakfast',
-                    'coffee', 'tea', 'pizza', 'burger', 'sandwich', 'rice', 'bread', 'milk', 'meat', 'fish', 'vegetable',
-                    'fruit', 'snack', 'drink', 'juice', 'water', 'beer', 'wine', 'cafe', 'kitchen', 'cook', 'cooking',
-                    'order', 'delivery', 'takeout', 'buffet', 'menu', 'dish', 'curry', 'soup', 'salad', 'pasta'
-                ],
-                'Transportation': [
-                    'gas', 'fuel', 'uber', 'lyft', 'taxi', 'car', 'bus', 'train', 'ride', 'auto', 'rickshaw', 'metro',
-                    'subway', 'transport', 'travel', 'drive', 'driving', 'parking', 'toll', 'petrol', 'diesel',
-                    'vehicle', 'bike', 'bicycle', 'motorcycle', 'scooter', 'flight', 'plane', 'airline', 'airport',
-                    'station', 'stop', 'journey', 'trip', 'commute', 'pickup', 'drop', 'fare', 'ticket'
-                ],
-                'Shopping': [
-                    'shop', 'shopping', 'store', 'buy', 'purchase', 'amazon', 'walmart', 'target', 'mall', 'market',
-                    'clothes', 'shirt', 'pants', 'shoes', 'dress', 'bag', 'phone', 'laptop', 'book', 'pen', 'paper',
-                    'grocery', 'supermarket', 'retail', 'sale', 'discount', 'offer', 'deal', 'cart', 'checkout',
-                    'order', 'online', 'delivery', 'item', 'product', 'goods', 'merchandise', 'clothing', 'apparel'
-                ],
-                'Entertainment': [
-                    'movie', 'theater', 'cinema', 'netflix', 'spotify', 'gym', 'game', 'gaming', 'music', 'concert',
-                    'show', 'entertainment', 'fun', 'play', 'sport', 'cricket', 'football', 'tennis', 'swimming',
-                    'party', 'club', 'bar', 'pub', 'dance', 'festival', 'event', 'ticket', 'subscription', 'streaming',
-                    'youtube', 'video', 'tv', 'television', 'radio', 'podcast', 'book', 'reading', 'hobby'
-                ],
-                'Technology': [
-                    'apple', 'samsung', 'computer', 'phone', 'iphone', 'laptop', 'tech', 'software', 'app', 'internet',
-                    'wifi', 'data', 'mobile', 'smartphone', 'tablet', 'ipad', 'android', 'windows', 'mac', 'google',
-                    'microsoft', 'adobe', 'subscription', 'license', 'cloud', 'storage', 'backup', 'antivirus',
-                    'camera', 'headphones', 'speaker', 'charger', 'cable', 'bluetooth', 'electronic', 'digital'
-                ],
-                'Bills & Utilities': [
-                    'bill', 'electric', 'electricity', 'gas', 'water', 'internet', 'phone', 'insurance', 'rent',
-                    'utility', 'payment', 'monthly', 'recurring', 'service', 'maintenance', 'repair', 'cable',
-                    'broadband', 'wifi', 'landline', 'mobile', 'postpaid', 'prepaid', 'recharge', 'top-up',
-                    'bank', 'loan', 'emi', 'credit', 'debit', 'fee', 'charge', 'tax', 'fine', 'penalty'
-                ],
-                'Healthcare': [
-                    'doctor', 'hospital', 'medical', 'pharmacy', 'health', 'dental', 'medicine', 'tablet', 'syrup',
-                    'injection', 'vaccine', 'checkup', 'consultation', 'treatment', 'therapy', 'surgery', 'test',
-                    'scan', 'xray', 'blood', 'urine', 'prescription', 'drug', 'clinic', 'nursing', 'ambulance',
-                    'emergency', 'first-aid', 'wellness', 'fitness', 'yoga', 'meditation', 'counseling'
-                ],
-                'Travel': [
-                    'hotel', 'flight', 'travel', 'vacation', 'trip', 'airline', 'booking', 'ticket', 'tour', 'holiday',
-                    'resort', 'accommodation', 'stay', 'room', 'suite', 'lodge', 'guest', 'check-in', 'checkout',
-                    'luggage', 'baggage', 'passport', 'visa', 'customs', 'immigration', 'departure', 'arrival',
-                    'journey', 'destination', 'sightseeing', 'cruise', 'safari', 'adventure', 'excursion'
-                ],
-                'Education': [
-                    'school', 'college', 'university', 'education', 'course', 'book', 'study', 'learning', 'class',
-                    'teacher', 'student', 'tuition', 'fees', 'admission', 'exam', 'test', 'assignment', 'project',
-                    'homework', 'notebook', 'pen', 'pencil', 'stationery', 'library', 'research', 'degree',
-                    'diploma', 'certificate', 'training', 'workshop', 'seminar', 'lecture', 'tutorial'
-                ],
-                'Business': [
-                    'office', 'business', 'professional', 'consulting', 'supplies', 'meeting', 'conference', 'client',
-                    'customer', 'project', 'work', 'job', 'career', 'salary', 'bonus', 'commission', 'expense',
-                    'report', 'presentation', 'document', 'file', 'printer', 'computer', 'software', 'license',
-                    'marketing', 'advertising', 'promotion', 'brand', 'company', 'corporate', 'enterprise'
-                ]
-            }
-            
-            category_indicator_found = False
-            strong_match_count = 0
-            
-            if top_category in strong_indicators:
-                for indicator in strong_indicators[top_category]:
-                    if indicator in desc_clean:
-                        category_indicator_found = True
-                        strong_match_count += 1
+            indicator_counts = self._strong_indicator_counts.get(top_category, {})
+            strong_match_count = sum(indicator_counts.get(term, 0) for term in found_terms)
+            category_indicator_found = strong_match_count > 0
             
             if brand_detected:
                 # Brand detected - ultra boost
@@ -632,59 +954,19 @@ class UltraPerfectExpenseCategorizer:
                 top_confidence = min(top_confidence * confidence_multiplier, self.ml_weights['confidence_ceiling'])
         
         # Ensure ultra-high confidence for brand matches
-        for brand, (brand_category, brand_conf) in self.brand_confidence.items():
-            if brand in desc_clean and top_category == brand_category:
-                top_confidence = max(top_confidence, brand_conf)
+        for i in brand_hits:
+            if top_category == self._brand_categories[i]:
+                top_confidence = max(top_confidence, self._brand_confidences[i])
                 break
         
         # Special handling for very common daily terms - force high confidence
-        daily_terms_boost = {
-            # Food terms
-            'chicken': ('Food & Dining', 0.92),
-            'chicken curry': ('Food & Dining', 0.92),
-            'food': ('Food & Dining', 0.88),
-            'coffee': ('Food & Dining', 0.88),
-            'lunch': ('Food & Dining', 0.88),
-            'dinner': ('Food & Dining', 0.88),
-            'grocery': ('Food & Dining', 0.88),
-            
-            # Transportation terms (enhanced)
-            'bus': ('Transportation', 0.92),
-            'bus fare': ('Transportation', 0.92),
-            'bus ticket': ('Transportation', 0.92),
-            'auto': ('Transportation', 0.92),
-            'auto rickshaw': ('Transportation', 0.92),
-            'autorickshaw': ('Transportation', 0.92),
-            'auto-rickshaw': ('Transportation', 0.92),
-            'rickshaw': ('Transportation', 0.92),
-            'taxi': ('Transportation', 0.90),
-            'cab': ('Transportation', 0.90),
-            'gas': ('Transportation', 0.88),
-            'petrol': ('Transportation', 0.88),
-            'fuel': ('Transportation', 0.88),
-            'train': ('Transportation', 0.90),
-            'metro': ('Transportation', 0.90),
-            'travel': ('Transportation', 0.88),
-            'transport': ('Transportation', 0.88),
-            
-            # Other categories
-            'movie': ('Entertainment', 0.88),
-            'doctor': ('Healthcare', 0.88),
-            'medicine': ('Healthcare', 0.88),
-            'shopping': ('Shopping', 0.88),
-            'phone': ('Technology', 0.85),
-            'internet': ('Bills & Utilities', 0.85),
-            'electricity': ('Bills & Utilities', 0.85),
-            'water': ('Bills & Utilities', 0.85)
-        }
-        
-        for term, (expected_category, min_confidence) in daily_terms_boost.items():
+        for term, (expected_category, min_confidence) in self.DAILY_TERMS_BOOST.items():
             # Check both exact phrase and individual words for compound terms
-            if term in desc_clean and top_category == expected_category:
+            if term in found_terms and top_category == expected_category:
                 top_confidence = max(top_confidence, min_confidence)
             elif ' ' in term:  # For compound terms, also check if all words are present
                 words = term.split()
-                if all(word in desc_clean for word in words) and top_category == expected_category:
+                if all(word in found_terms for word in words) and top_category == expected_category:
                     top_confidence = max(top_confidence, min_confidence)
                 break
         
@@ -692,16 +974,7 @@ class UltraPerfectExpenseCategorizer:
         if top_confidence > 0.35:
             top_confidence = max(top_confidence, 0.80)  # Minimum 80% for good matches
         
-        # Create ultra-precise suggested categories
-        sorted_categories = sorted(normalized_scores.items(), key=lambda x: x[1], reverse=True)
-        suggested = sorted_categories[:3]
-        
-        return {
-            'category': top_category,
-            'confidence': top_confidence,
-            'all_probabilities': normalized_scores,
-            'suggested': suggested
-        }
+        return top_category, top_confidence, tuple(normalized_scores.items()), tuple(suggested)
 
     def _ultra_clean_description(self, description: str) -> str:
         """Ultra-advanced description cleaning and normalization"""
@@ -709,371 +982,351 @@ class UltraPerfectExpenseCategorizer:
         desc = description.lower().strip()
         
         # Remove common prefixes/suffixes that don't add meaning
-        desc = re.sub(r'\b(payment|charge|purchase|order|transaction|invoice|bill)\b', '', desc)
-        
-        # Normalize brand variations
-        brand_normalizations = {
-            'mcdonald': 'mcdonalds',
-            'mc donald': 'mcdonalds',
-            'mac donald': 'mcdonalds',
-            'star buck': 'starbucks',
-            'star bucks': 'starbucks',
-            'dunkin donut': 'dunkin',
-            'dunking donut': 'dunkin',
-            'amazon.com': 'amazon',
-            'walmart.com': 'walmart',
-            'target.com': 'target',
-        }
-        
-        for variant, normalized in brand_normalizations.items():
-            desc = desc.replace(variant, normalized)
+        desc = _FILLER_WORDS_RE.sub('', desc)
         
-        # Remove special characters but keep spaces and alphanumeric
-        desc = re.sub(r'[^\w\s]', ' ', desc)
+        # Normalize brand variations; one search skips them for the usual
+        # description that contains none
+        if _BRAND_VARIANT_RE.search(desc):
+            for variant, normalized in _BRAND_NORMALIZATIONS:
+                desc = desc.replace(variant, normalized)
         
-        # Remove extra whitespace
-        desc = re.sub(r'\s+', ' ', desc)
+        # Remove special characters and extra whitespace in one pass: tokens
+        # end up separated by single spaces
+        desc = _NON_WORD_RE.sub(' ', desc)
         
-        # Normalize unicode characters
-        desc = unicodedata.normalize('NFKD', desc)
+        # Normalize unicode characters (ASCII text is already NFKD-normal)
+        if not desc.isascii():
+            desc = unicodedata.normalize('NFKD', desc)
         
         return desc
 
-    def _calculate_ultra_score(self, description: str, category: str, amount: Optional[float]) -> float:
-        """Calculate ultra-precise score using advanced AI techniques"""
-        score = 0.0
+    def _calculate_ultra_scores(self, description: str, amount: Optional[float],
+                                brand_hits: List[int]) -> Dict[str, float]:
+        """
+        Calculate the ultra-precise score of every category using advanced AI
+        techniques; keywords are matched once for all categories
+        """
         weights = self.ml_weights
+        brand_scores = self._calculate_brand_scores(brand_hits)
+        # One snapshot of the keyword tables for both keyword-based scores
+        keyword_state = self._keyword_state
+        keyword_scores, priority_scores = self._calculate_keyword_scores(description, keyword_state)
+        proximity_scores = self._calculate_proximity_scores(description, keyword_state)
+        semantic_scores = self._calculate_semantic_scores(description)
+        pattern_scores = self._calculate_pattern_scores(description)
+        amount_scores = self._calculate_ultra_amount_scores(amount) if amount is not None else {}
         
-        # 1. Brand-based ultra-precision (highest confidence)
-        brand_score = self._calculate_brand_score(description, category)
-        score += brand_score * weights['exact_brand_match']
-        
-        # 2. Priority keyword matching (override other categories for specific terms)
-        priority_score = self._calculate_priority_keyword_score(description, category)
-        score += priority_score * 0.4  # High weight for priority matches
-        
-        # 3. Keyword matching with frequency analysis
-        keyword_score = self._calculate_keyword_score(description, category)
-        score += keyword_score * weights['keyword_match']
-        
-        # 4. Advanced semantic pattern matching
-        semantic_score = self._calculate_semantic_score(description, category)
-        score += semantic_score * weights['semantic_similarity']
-        
-        # 5. Pattern matching with context
-        pattern_score = self._calculate_pattern_score(description, category)
-        score += pattern_score * weights['pattern_match']
-        
-        # 6. Amount-based intelligence
-        if amount is not None:
-            amount_score = self._calculate_ultra_amount_score(category, amount)
-            score += amount_score * weights['amount_context']
+        scores = {}
+        for category in self.categories:
+            score = 0.0
+            
+            # 1. Brand-based ultra-precision (highest confidence)
+            brand_score = brand_scores.get(category, 0.0)
+            score += brand_score * weights['exact_brand_match']
+            
+            # 2. Priority keyword matching (override other categories for specific terms)
+            priority_score = priority_scores.get(category, 0.0)
+            score += priority_score * 0.4  # High weight for priority matches
+            
+            # 3. Keyword matching with frequency analysis
+            keyword_score = keyword_scores.get(category, 0.0)
+            score += keyword_score * weights['keyword_match']
+            
+            # 4. Advanced semantic pattern matching
+            semantic_score = semantic_scores.get(category, 0.0)
+            score += semantic_score * weights['semantic_similarity']
+            
+            # 5. Pattern matching with context
+            pattern_score = pattern_scores.get(category, 0.0)
+            score += pattern_score * weights['pattern_match']
+            
+            # 6. Amount-based intelligence
+            if amount is not None:
+                amount_score = amount_scores.get(category, 0.0)
+                score += amount_score * weights['amount_context']
+            
+            # 7. Word proximity and co-occurrence analysis
+            proximity_score = proximity_scores.get(category, 0.0)
+            score += proximity_score * weights['word_proximity']
+            
+            scores[category] = min(score, 1.0)
         
-        # 7. Word proximity and co-occurrence analysis
-        proximity_score = self._calculate_proximity_score(description, category)
-        score += proximity_score * weights['word_proximity']
+        return scores
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
+    def _build_term_index() -> Tuple[_SubstringIndex, Mapping[str, Dict[str, int]]]:
+        """
+        Index the strong indicators, the daily terms and the words of compound
+        daily terms for substring search, and count how many times each
+        indicator is listed per category
+        """
+        cls = UltraPerfectExpenseCategorizer
+        terms = {term for indicators in cls.STRONG_INDICATORS.values() for term in indicators}
+        for term in cls.DAILY_TERMS_BOOST:
+            terms.add(term)
+            terms.update(term.split())
         
-        return min(score, 1.0)
+        indicator_counts: Dict[str, Dict[str, int]] = {}
+        for category, indicators in cls.STRONG_INDICATORS.items():
+            counts = indicator_counts[category] = {}
+            for indicator in indicators:
+                counts[indicator] = counts.get(indicator, 0) + 1
+        return _SubstringIndex(sorted(terms)), MappingProxyType(indicator_counts)
 
-    def _calculate_priority_keyword_score(self, description: str, category: str) -> float:
-        """Calculate priority keyword score for terms that should override other categories"""
-        priority_keywords = {
-            'Transportation': [
-                'bus', 'auto', 'taxi', 'cab', 'rickshaw', 'uber', 'lyft', 'train', 'metro', 'flight',
-                'gas', 'petrol', 'fuel', 'diesel', 'parking', 'toll', 'fare', 'ride', 'transport',
-                'car', 'bike', 'scooter', 'motorcycle', 'vehicle', 'drive', 'driving'
-            ],
-            'Technology': [
-                'phone', 'mobile', 'smartphone', 'iphone', 'android', 'laptop', 'computer', 'tablet',
-                'ipad', 'software', 'app', 'internet', 'wifi', 'data', 'tech', 'electronic'
-            ],
-            'Healthcare': [
-                'doctor', 'hospital', 'medical', 'medicine', 'pharmacy', 'health', 'clinic',
-                'dental', 'dentist', 'prescription', 'tablet', 'syrup', 'injection'
-            ],
-            'Entertainment': [
-                'movie', 'cinema', 'theater', 'netflix', 'spotify', 'game', 'gaming', 'music',
-                'concert', 'show', 'gym', 'sport', 'cricket', 'football'
-            ],
-            'Bills & Utilities': [
-                'electricity', 'electric', 'water', 'gas', 'internet', 'phone', 'mobile',
-                'bill', 'utility', 'insurance', 'rent', 'emi', 'loan'
-            ]
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
+    def _pack_brand_table() -> Tuple[Tuple[str, ...], Tuple[str, ...], Tuple[float, ...], Tuple[float, ...]]:
+        """
+        Split brand_confidence into parallel tuples (name, category,
+        confidence, brand score), in table order
+        """
+        brands = UltraPerfectExpenseCategorizer._load_brand_confidence()
+        scores = []
+        for brand, (_, confidence) in brands.items():
+            # Ultra-high confidence for exact brand matches
+            brand_length_factor = len(brand) / 20.0  # Longer brand names get higher confidence
+            scores.append(min(confidence + min(brand_length_factor, 0.05), 1.0))
+        return (tuple(brands), tuple(category for category, _ in brands.values()),
+                tuple(confidence for _, confidence in brands.values()), tuple(scores))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
+    def _build_brand_index() -> _SubstringIndex:
+        """Substring index over the brand names, in table order"""
+        return _SubstringIndex(UltraPerfectExpenseCategorizer._pack_brand_table()[0])
+
+    def _find_brands(self, description: str) -> List[int]:
+        """Indices of the brands occurring in description, in table order"""
+        return sorted(self._brand_index.find(description))
+
+    def _calculate_brand_scores(self, brand_hits: List[int]) -> Dict[str, float]:
+        """Calculate brand-specific confidence score of every category: its first brand found"""
+        scores: Dict[str, float] = {}
+        for i in brand_hits:
+            scores.setdefault(self._brand_categories[i], self._brand_scores[i])
+        return scores
+
+    def _build_keyword_index(self):
+        """
+        Map each distinct keyword to the (category, position, importance, bonuses)
+        entries it scores for and the (category, position) priority keyword
+        entries it scores for, and index the keywords for substring search.
+        Rebuilt whenever ultra_keywords changes; the tables are built aside and
+        published as one snapshot, so a concurrent prediction sees either the
+        old or the new tables, never a mix
+        """
+        entries: Dict[str, List[Tuple[str, int, float, Tuple[float, ...]]]] = {}
+        for category, keywords in self.ultra_keywords.items():
+            # Extra bonus for category-specific keywords
+            category_bonus = {
+                'coffee': 0.4 if category == 'Food & Dining' else 0,
+                'shop': 0.3,
+                'store': 0.3,
+                'station': 0.3 if category == 'Transportation' else 0,
+                'theater': 0.4 if category == 'Entertainment' else 0,
+                'grocery': 0.4 if category == 'Food & Dining' else 0,
+                'gas': 0.4 if category == 'Transportation' else 0,
+                'movie': 0.4 if category == 'Entertainment' else 0,
+            }
+            for position, keyword in enumerate(keywords):
+                # Weight based on keyword specificity and length
+                specificity = len(keyword) / 15.0  # Longer keywords are more specific
+                importance = min(specificity, 1.0) + 0.3  # Increased base importance
+                bonuses = tuple(bonus_value for bonus_word, bonus_value in category_bonus.items()
+                                if bonus_word in keyword and bonus_value)
+                entries.setdefault(keyword, []).append((category, position, importance, bonuses))
+        priority_entries: Dict[str, List[Tuple[str, int]]] = {}
+        for category, keywords in self.PRIORITY_KEYWORDS.items():
+            for position, keyword in enumerate(keywords):
+                priority_entries.setdefault(keyword, []).append((category, position))
+        
+        keyword_entries = [
+            (keyword, tuple(entries.get(keyword, ())), tuple(priority_entries.get(keyword, ())))
+            for keyword in {**entries, **priority_entries}
+        ]
+        # Categories listing each keyword, for O(1) membership tests when learning
+        keyword_categories: Dict[str, FrozenSet[str]] = {
+            keyword: frozenset(category for category, _, _, _ in hits) for keyword, hits in entries.items()
         }
         
-        if category not in priority_keywords:
-            return 0.0
+        keyword_index = _SubstringIndex(keyword for keyword, _, _ in keyword_entries)
         
-        keywords = priority_keywords[category]
-        score = 0.0
+        # Keyword list length of each category, the keyword score's denominator
+        keyword_counts = {category: len(keywords) for category, keywords in self.ultra_keywords.items()}
         
-        for keyword in keywords:
-            if keyword in description:
-                # High score for priority matches
-                if re.search(r'\b' + re.escape(keyword) + r'\b', description):
-                    score += 0.8  # Very high score for exact word matches
-                else:
-                    score += 0.6  # High score for partial matches
+        # Keyword hits of a single word, memoized for the proximity score
+        word_keyword_hits = functools.lru_cache(maxsize=16384)(
+            functools.partial(self._match_word_keywords, keyword_index, keyword_entries)
+        )
         
-        return min(score, 1.0)
+        self._keyword_categories = keyword_categories
+        self._keyword_state = (keyword_index, keyword_entries, keyword_counts, word_keyword_hits)
 
-    def _calculate_brand_score(self, description: str, category: str) -> float:
-        """Calculate brand-specific confidence score"""
-        score = 0.0
-        
-        for brand, (brand_category, confidence) in self.brand_confidence.items():
-            if brand in description and brand_category == category:
-                # Ultra-high confidence for exact brand matches
-                brand_length_factor = len(brand) / 20.0  # Longer brand names get higher confidence
-                score = confidence + min(brand_length_factor, 0.05)
-                return min(score, 1.0)
-        
-        return score
+    @staticmethod
+    def _match_word_keywords(keyword_index: '_SubstringIndex', keyword_entries: List[Tuple],
+                             word: str) -> Tuple[Tuple[str, int], ...]:
+        """(category, number of keyword-list entries contained in word) pairs"""
+        counts: Dict[str, int] = {}
+        for i in keyword_index.find(word):
+            for category, _, _, _ in keyword_entries[i][1]:
+                counts[category] = counts.get(category, 0) + 1
+        return tuple(counts.items())
 
-    def _calculate_keyword_score(self, description: str, category: str) -> float:
-        """Calculate keyword matching score with frequency analysis"""
-        keywords = self.ultra_keywords.get(category, [])
-        if not keywords:
-            return 0.0
+    def _calculate_keyword_scores(self, description: str, keyword_state: Tuple) -> Tuple[Dict[str, float], Dict[str, float]]:
+        """
+        Keyword matching score with frequency analysis and priority keyword
+        score of every category, from one pass over the description
+        """
+        keyword_index, keyword_entries, keyword_counts, _ = keyword_state
+        found = keyword_index.find(description)
         
         # Count keyword matches with importance weighting
-        weighted_matches = 0.0
-        total_weight = 0.0
-        match_count = 0
-        
-        for keyword in keywords:
-            if keyword in description:
-                match_count += 1
-                # Weight based on keyword specificity and length
-                specificity = len(keyword) / 15.0  # Longer keywords are more specific
-                importance = min(specificity, 1.0) + 0.3  # Increased base importance
-                
-                # Bonus for exact word boundaries
-                if re.search(r'\b' + re.escape(keyword) + r'\b', description):
+        matched: Dict[str, List[Tuple[int, float]]] = {}
+        priority_matched: Dict[str, List[Tuple[int, float]]] = {}
+        for i in found:
+            keyword, hits, priority_hits = keyword_entries[i]
+            # Bonus for exact word boundaries
+            exact = _contains_word(description, keyword)
+            for category, position in priority_hits:
+                # High score for priority matches: very high for exact word matches
+                priority_matched.setdefault(category, []).append((position, 0.8 if exact else 0.6))
+            for category, position, importance, bonuses in hits:
+                if exact:
                     importance *= 2.0  # Doubled bonus for exact matches
-                
-                # Extra bonus for category-specific keywords
-                category_bonus = {
-                    'coffee': 0.4 if category == 'Food & Dining' else 0,
-                    'shop': 0.3,
-                    'store': 0.3,
-                    'station': 0.3 if category == 'Transportation' else 0,
-                    'theater': 0.4 if category == 'Entertainment' else 0,
-                    'grocery': 0.4 if category == 'Food & Dining' else 0,
-                    'gas': 0.4 if category == 'Transportation' else 0,
-                    'movie': 0.4 if category == 'Entertainment' else 0,
-                }
-                
-                for bonus_word, bonus_value in category_bonus.items():
-                    if bonus_word in keyword:
-                        importance += bonus_value
-                
-                weighted_matches += importance
-                total_weight += 1.0
+                for bonus_value in bonuses:
+                    importance += bonus_value
+                matched.setdefault(category, []).append((position, importance))
         
-        if total_weight > 0:
+        keyword_scores = {}
+        for category, hits in matched.items():
+            # Summed in keyword-list order, like the original per-category scan
+            weighted_matches = 0.0
+            for _, importance in sorted(hits):
+                weighted_matches += importance
+            match_count = len(hits)
+            
             # Enhanced scoring for multiple matches
-            base_score = weighted_matches / len(keywords) * 3.0  # Increased multiplier
+            base_score = weighted_matches / keyword_counts[category] * 3.0  # Increased multiplier
             
             # Bonus for multiple keyword matches
             if match_count > 1:
                 base_score *= (1 + (match_count - 1) * 0.2)
             
-            return min(base_score, 1.0)
+            keyword_scores[category] = min(base_score, 1.0)
         
-        return 0.0
-
-    def _calculate_semantic_score(self, description: str, category: str) -> float:
-        """Calculate semantic pattern matching score"""
-        patterns = self.semantic_patterns.get(category, [])
-        if not patterns:
-            return 0.0
+        priority_scores = {}
+        for category, hits in priority_matched.items():
+            score = 0.0
+            for _, value in sorted(hits):
+                score += value
+            priority_scores[category] = min(score, 1.0)
         
-        score = 0.0
-        for pattern in patterns:
-            if re.search(pattern, description, re.IGNORECASE):
+        return keyword_scores, priority_scores
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
+    def _compile_semantic_patterns():
+        """
+        Compile the semantic patterns once, each with its weight. Every
+        category also gets the union of its patterns, so a category none of
+        them match costs a single search
+        """
+        regexes = {}
+        for category, patterns in UltraPerfectExpenseCategorizer._load_semantic_patterns().items():
+            compiled = []
+            for pattern in patterns:
                 # Weight based on pattern complexity
                 pattern_complexity = len(pattern) / 100.0
-                score += 0.3 + min(pattern_complexity, 0.2)
-        
-        return min(score, 1.0)
+                compiled.append((re.compile(pattern, re.IGNORECASE), 0.3 + min(pattern_complexity, 0.2)))
+            any_regex = re.compile('|'.join(f'(?:{pattern})' for pattern in patterns), re.IGNORECASE)
+            regexes[category] = (any_regex, tuple(compiled))
+        return MappingProxyType(regexes)
 
-    def _calculate_pattern_score(self, description: str, category: str) -> float:
-        """Calculate advanced pattern matching score"""
-        # Context-aware pattern analysis
-        context_patterns = {
-            'Food & Dining': [
-                (r'\b(eat|ate|food|meal|restaurant|cafe)\b', 0.3),
-                (r'\b(delivery|takeout|pickup)\b', 0.25),
-                (r'\b(breakfast|lunch|dinner|brunch|snack)\b', 0.2),
-            ],
-            'Transportation': [
-                (r'\b(ride|trip|travel|transport)\b', 0.3),
-                (r'\b(airport|station|terminal)\b', 0.25),
-                (r'\b(fuel|gas|parking|toll)\b', 0.2),
-            ],
-            'Shopping': [
-                (r'\b(buy|bought|purchase|order|shop)\b', 0.3),
-                (r'\b(store|mall|online|website)\b', 0.25),
-                (r'\b(sale|discount|deal|coupon)\b', 0.2),
-            ],
-            'Entertainment': [
-                (r'\b(watch|play|game|music|show)\b', 0.3),
-                (r'\b(ticket|event|concert|movie)\b', 0.25),
-                (r'\b(subscription|streaming|monthly)\b', 0.2),
-            ],
-        }
+    def _calculate_semantic_scores(self, description: str) -> Dict[str, float]:
+        """Calculate semantic pattern matching score of every category"""
+        scores = {}
+        for category, (any_regex, compiled) in self._semantic_regexes.items():
+            if not any_regex.search(description):
+                continue
+            score = 0.0
+            for regex, weight in compiled:
+                if regex.search(description):
+                    score += weight
+            scores[category] = min(score, 1.0)
         
-        patterns = context_patterns.get(category, [])
-        score = 0.0
-        
-        for pattern, weight in patterns:
-            if re.search(pattern, description, re.IGNORECASE):
-                score += weight
-        
-        return min(score, 1.0)
+        return scores
 
-    def _calculate_ultra_amount_score(self, category: str, amount: float) -> float:
-        """Calculate ultra-precise amount-based scoring"""
-        # Enhanced amount ranges with confidence modifiers
-        amount_intelligence = {
-            'Food & Dining': {
-                'typical_range': (3, 150),
-                'confidence_peak': (8, 60),
-                'boost_factor': 0.15,
-                'penalty_factor': 0.08
-            },
-            'Transportation': {
-                'typical_range': (5, 500),
-                'confidence_peak': (15, 200),
-                'boost_factor': 0.12,
-                'penalty_factor': 0.06
-            },
-            'Shopping': {
-                'typical_range': (10, 2000),
-                'confidence_peak': (25, 500),
-                'boost_factor': 0.1,
-                'penalty_factor': 0.05
-            },
-            'Entertainment': {
-                'typical_range': (5, 300),
-                'confidence_peak': (10, 100),
-                'boost_factor': 0.12,
-                'penalty_factor': 0.06
-            },
-            'Technology': {
-                'typical_range': (50, 5000),
-                'confidence_peak': (200, 2000),
-                'boost_factor': 0.18,
-                'penalty_factor': 0.1
-            },
-            'Bills & Utilities': {
-                'typical_range': (25, 1000),
-                'confidence_peak': (50, 400),
-                'boost_factor': 0.15,
-                'penalty_factor': 0.08
-            },
-            'Healthcare': {
-                'typical_range': (20, 2000),
-                'confidence_peak': (50, 500),
-                'boost_factor': 0.12,
-                'penalty_factor': 0.06
-            },
-            'Travel': {
-                'typical_range': (100, 5000),
-                'confidence_peak': (300, 2000),
-                'boost_factor': 0.15,
-                'penalty_factor': 0.08
-            },
-            'Education': {
-                'typical_range': (25, 10000),
-                'confidence_peak': (100, 2000),
-                'boost_factor': 0.12,
-                'penalty_factor': 0.06
-            },
-            'Business': {
-                'typical_range': (20, 5000),
-                'confidence_peak': (50, 1000),
-                'boost_factor': 0.1,
-                'penalty_factor': 0.05
-            },
-        }
-        
-        if category not in amount_intelligence:
-            return 0.0
-        
-        intel = amount_intelligence[category]
-        typical_min, typical_max = intel['typical_range']
-        peak_min, peak_max = intel['confidence_peak']
-        
-        if peak_min <= amount <= peak_max:
-            # In optimal range - maximum boost
-            return intel['boost_factor']
-        elif typical_min <= amount <= typical_max:
-            # In typical range - moderate boost
-            return intel['boost_factor'] * 0.7
-        elif amount > typical_max * 2:
-            # Too high - penalty
-            return -intel['penalty_factor']
-        elif amount < typical_min * 0.5:
-            # Too low - penalty
-            return -intel['penalty_factor'] * 0.5
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
+    def _compile_context_patterns():
+        """Compile the context patterns once, each with its weight"""
+        return MappingProxyType({
+            category: tuple((re.compile(pattern, re.IGNORECASE), weight) for pattern, weight in patterns)
+            for category, patterns in UltraPerfectExpenseCategorizer.CONTEXT_PATTERNS.items()
+        })
+
+    def _calculate_pattern_scores(self, description: str) -> Dict[str, float]:
+        """Calculate advanced pattern matching score of every category"""
+        scores = {}
+        for category, patterns in self._context_regexes.items():
+            score = 0.0
+            
+            for regex, weight in patterns:
+                if regex.search(description):
+                    score += weight
+            
+            scores[category] = min(score, 1.0)
         
-        return 0.0
+        return scores
 
-    def _calculate_proximity_score(self, description: str, category: str) -> float:
-        """Calculate word proximity and co-occurrence score"""
-        keywords = self.ultra_keywords.get(category, [])
-        if not keywords:
-            return 0.0
+    def _calculate_ultra_amount_scores(self, amount: float) -> Dict[str, float]:
+        """Calculate ultra-precise amount-based scoring of every category"""
+        scores = {}
+        for category, intel in self.AMOUNT_INTELLIGENCE.items():
+            typical_min, typical_max = intel['typical_range']
+            peak_min, peak_max = intel['confidence_peak']
+            
+            if peak_min <= amount <= peak_max:
+                # In optimal range - maximum boost
+                scores[category] = intel['boost_factor']
+            elif typical_min <= amount <= typical_max:
+                # In typical range - moderate boost
+                scores[category] = intel['boost_factor'] * 0.7
+            elif amount > typical_max * 2:
+                # Too high - penalty
+                scores[category] = -intel['penalty_factor']
+            elif amount < typical_min * 0.5:
+                # Too low - penalty
+                scores[category] = -intel['penalty_factor'] * 0.5
         
+        return scores
+
+    def _calculate_proximity_scores(self, description: str, keyword_state: Tuple) -> Dict[str, float]:
+        """Calculate word proximity and co-occurrence score of every category"""
         words = description.split()
         if len(words) < 2:
-            return 0.0
+            return {}
+        word_keyword_hits = keyword_state[3]
         
-        # Calculate co-occurrence patterns
-        score = 0.0
+        # Calculate co-occurrence patterns: every keyword contained in a word
+        scores: Dict[str, float] = {}
         for i, word in enumerate(words):
-            for keyword in keywords:
-                if word == keyword or keyword in word:
-                    # Bonus for keywords near beginning or end
-                    position_bonus = 0.1 if i < 2 or i >= len(words) - 2 else 0.05
+            # Bonus for keywords near beginning or end
+            position_bonus = 0.1 if i < 2 or i >= len(words) - 2 else 0.05
+            for category, count in word_keyword_hits(word):
+                score = scores.get(category, 0.0)
+                for _ in range(count):
                     score += 0.05 + position_bonus
+                scores[category] = score
         
-        return min(score, 0.3)
+        return {category: min(score, 0.3) for category, score in scores.items()}
 
     def _apply_ai_boosters(self, description: str, amount: Optional[float], scores: Dict[str, float]) -> Dict[str, float]:
         """Apply advanced AI confidence boosters"""
         
-        # Context-aware boosters
-        context_boosters = [
-            # Location-based intelligence
-            {
-                'condition': lambda d, a: 'airport' in d,
-                'boosts': {'Travel': 0.25, 'Food & Dining': 0.15, 'Transportation': 0.2}
-            },
-            {
-                'condition': lambda d, a: 'online' in d or 'website' in d or '.com' in d,
-                'boosts': {'Shopping': 0.2, 'Entertainment': 0.15, 'Technology': 0.1}
-            },
-            # Time-based intelligence
-            {
-                'condition': lambda d, a: any(word in d for word in ['monthly', 'subscription', 'recurring']),
-                'boosts': {'Entertainment': 0.2, 'Bills & Utilities': 0.25, 'Technology': 0.15}
-            },
-            # Amount-based intelligence
-            {
-                'condition': lambda d, a: a and a > 500,
-                'boosts': {'Technology': 0.15, 'Travel': 0.12, 'Shopping': 0.1}
-            },
-            {
-                'condition': lambda d, a: a and a < 10,
-                'boosts': {'Food & Dining': 0.2, 'Transportation': 0.1}
-            },
-        ]
-        
         # Apply context boosters
-        for booster in context_boosters:
+        for booster in self.CONTEXT_BOOSTERS:
             if booster['condition'](description, amount):
                 for category, boost_value in booster['boosts'].items():
                     if category in scores:
@@ -1081,13 +1334,36 @@ class UltraPerfectExpenseCategorizer:
         
         return scores
 
-    def predict_batch(self, descriptions: List[str], amounts: Optional[List[float]] = None) -> List[Dict]:
-        """Ultra-perfect batch prediction with optimized performance"""
-        results = []
+    def predict_batch(self, descriptions: List[str], amounts: Optional[List[Optional[float]]] = None) -> List[Dict]:
+        """
+        Ultra-perfect batch prediction with optimized performance. Rows are
+        cleaned once and every distinct (description, amount) pair is scored
+        only once
+        """
+        unique_rows: Dict[Tuple[str, Optional[float]], Tuple] = {}
+        row_keys: List[Optional[Tuple[str, Optional[float]]]] = []
         for i, description in enumerate(descriptions):
+            if not description or not description.strip():
+                row_keys.append(None)
+                continue
             amount = amounts[i] if amounts and i < len(amounts) else None
-            result = self.predict(description, amount)
-            results.append(result)
+            key = (self._ultra_clean_description(description), amount)
+            if key not in unique_rows:
+                unique_rows[key] = self._predict_cached(*key)
+            row_keys.append(key)
+        
+        results = []
+        for row_key in row_keys:
+            if row_key is None:
+                results.append(self.predict(''))
+                continue
+            top_category, top_confidence, probabilities, suggested = unique_rows[row_key]
+            results.append({
+                'category': top_category,
+                'confidence': top_confidence,
+                'all_probabilities': dict(probabilities),
+                'suggested': list(suggested)
+            })
         return results
 
     def get_categories(self) -> List[str]:
@@ -1104,24 +1380,29 @@ class UltraPerfectExpenseCategorizer:
         
         # Add significant keywords with intelligence
         if correct_category in self.ultra_keywords:
-            for keyword in keywords:
-                if len(keyword) > 2 and keyword not in self.ultra_keywords[correct_category]:
-                    # Check uniqueness across categories
-                    uniqueness_score = self._calculate_keyword_uniqueness(keyword, correct_category)
-                    
-                    if uniqueness_score > 0.7:  # Only add highly unique keywords
-                        self.ultra_keywords[correct_category].append(keyword)
-                        print(f"🧠 Learned ultra-specific keyword: '{keyword}' for {correct_category} (uniqueness: {uniqueness_score:.2f})")
+            with self._learn_lock:
+                for keyword in keywords:
+                    if len(keyword) > 2 and correct_category not in self._keyword_categories.get(keyword, ()):
+                        # Check uniqueness across categories
+                        uniqueness_score = self._calculate_keyword_uniqueness(keyword, correct_category)
+                        
+                        if uniqueness_score > 0.7:  # Only add highly unique keywords
+                            self.ultra_keywords[correct_category] += (sys.intern(keyword),)
+                            self._keyword_categories[keyword] = self._keyword_categories.get(keyword, frozenset()) | {correct_category}
+                            print(f"🧠 Learned ultra-specific keyword: '{keyword}' for {correct_category} (uniqueness: {uniqueness_score:.2f})")
+                
+                self._build_keyword_index()
+            # Cleared only once the new tables are published
+            self._predict_cached.cache_clear()
 
     def _calculate_keyword_uniqueness(self, keyword: str, target_category: str) -> float:
         """Calculate how unique a keyword is to a specific category"""
         appearances = 0
-        for category, keywords in self.ultra_keywords.items():
-            if keyword in keywords:
-                if category == target_category:
-                    appearances += 2  # Double weight for target category
-                else:
-                    appearances += 1
+        for category in self._keyword_categories.get(keyword, ()):
+            if category == target_category:
+                appearances += 2  # Double weight for target category
+            else:
+                appearances += 1
         
         # Higher score means more unique to target category
         if appearances == 0:
@@ -0,0 +1,221 @@
+"""
+Shared model server for the ONNX categorizer
+Holds one ONNX Runtime session for all gunicorn workers, so N workers don't
+each run their own intra-op threadpool on the same cores.
+
+Started by gunicorn's on_starting hook when MODEL_SERVER_SOCKET is set (and
+restarted by the master if it exits), or manually with: python model_server.py
+Workers talk to it through ModelServerClient over a UNIX-domain socket using
+length-prefixed JSON messages.
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import struct
+import threading
+import socketserver
+import logging
+from typing import Dict, List, Optional
+
+try:
+    import orjson
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj):
+        return json.dumps(obj).encode('utf-8')
+    _loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = '/tmp/finze.sock'
+_HEADER = struct.Struct('!I')
+
+
+def send_message(sock: socket.socket, obj) -> None:
+    """Send one length-prefixed JSON message"""
+    body = _dumps(obj)
+    sock.sendall(_HEADER.pack(len(body)) + body)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise ConnectionError('Model server connection closed')
+        buf += chunk
+    return bytes(buf)
+
+
+def recv_message(sock: socket.socket):
+    """Receive one length-prefixed JSON message"""
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return _loads(_recv_exact(sock, size))
+
+
+class ModelServerClient:
+    """
+    Categorizer proxy used inside the HTTP workers. Each thread keeps its
+    own connection, (re)opened lazily after fork.
+    """
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH,
+                 model_path: str = 'models/expense_distilbert_onnx/model_int8.onnx',
+                 connect_timeout: float = 60.0, request_timeout: float = 30.0):
+        """
+        Args:
+            socket_path: UNIX socket the model server listens on
+            model_path: ONNX model served, used to read the label list locally
+            connect_timeout: Seconds to keep retrying while the server starts
+            request_timeout: Seconds to wait for the server to answer a request
+        """
+        self.socket_path = socket_path
+        self.model_path = model_path
+        self.connect_timeout = connect_timeout
+        self.request_timeout = request_timeout
+        self._local = threading.local()
+        # Once the server has answered, a refused connection means it is down
+        # (or being restarted), not starting: fail fast instead of retrying
+        self._server_seen = False
+
+        config_file = os.path.join(os.path.dirname(model_path), 'config.json')
+        with open(config_file, 'r') as f:
+            id2label = json.load(f)['id2label']
+        self.labels = [id2label[str(i)] for i in range(len(id2label))]
+
+    def _connect(self) -> socket.socket:
+        # The server may still be loading the model when the first requests arrive
+        deadline = time.monotonic() + (0.0 if self._server_seen else self.connect_timeout)
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.socket_path)
+                sock.settimeout(self.request_timeout)
+                self._server_seen = True
+                return sock
+            except (FileNotFoundError, ConnectionRefusedError) as e:
+                sock.close()
+                if time.monotonic() >= deadline:
+                    raise ConnectionError(f'Model server not available at {self.socket_path}') from e
+                time.sleep(0.1)
+
+    def _call(self, request: Dict):
+        sock = getattr(self._local, 'sock', None)
+        if sock is None or self._local.pid != os.getpid():
+            sock = self._connect()
+            self._local.sock = sock
+            self._local.pid = os.getpid()
+
+        try:
+            send_message(sock, request)
+            response = recv_message(sock)
+        except socket.timeout as e:
+            # A late answer would be read as the reply to the next request
+            self._local.sock = None
+            sock.close()
+            raise TimeoutError(f'Model server did not answer within {self.request_timeout:g}s') from e
+        except OSError:
+            self._local.sock = None
+            sock.close()
+            raise
+
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return response['result']
+
+    def predict(self, description: str, amount: Optional[float] = None, merchant_name: str = '') -> Dict:
+        return self._call({'op': 'predict', 'description': description, 'amount': amount, 'merchant_name': merchant_name})
+
+    def predict_batch(self, descriptions: List[str], amounts: Optional[List[float]] = None,
+                      merchant_names: Optional[List[str]] = None) -> List[Dict]:
+        return self._call({
+            'op': 'predict_batch', 'descriptions': descriptions, 'amounts': amounts, 'merchant_names': merchant_names
+        })
+
+    def get_categories(self) -> List[str]:
+        return list(self.labels)
+
+    def add_correction(self, description: str, correct_category: str, amount: Optional[float] = None):
+        # The exported graph is frozen; corrections are only collected in data/corrections.csv
+        pass
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                request = recv_message(self.request)
+            except (ConnectionError, OSError):
+                return
+
+            try:
+                response = {'result': self.server.dispatch(request)}
+            except Exception as e:
+                logger.error(f"Model server request failed: {str(e)}")
+                response = {'error': str(e)}
+            send_message(self.request, response)
+
+
+class ModelServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves predictions from a single categorizer to every worker connection"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, categorizer, batcher=None):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, _RequestHandler)
+        self.categorizer = categorizer
+        self.batcher = batcher
+
+    def dispatch(self, request: Dict):
+        op = request.get('op')
+        if op == 'predict':
+            # Singles from all workers are coalesced into shared batches
+            predictor = self.batcher or self.categorizer
+            return predictor.predict(
+                request.get('description', ''), request.get('amount'), merchant_name=request.get('merchant_name') or ''
+            )
+        if op == 'predict_batch':
+            return self.categorizer.predict_batch(
+                request.get('descriptions', []), request.get('amounts'), merchant_names=request.get('merchant_names')
+            )
+        raise ValueError(f'Unknown operation: {op}')
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+    from ml_model.onnx_categorizer import OnnxCategorizer
+    from services.micro_batcher import MicroBatcher
+
+    socket_path = os.environ.get('MODEL_SERVER_SOCKET', DEFAULT_SOCKET_PATH)
+    model_path = os.environ.get('ONNX_MODEL_PATH', 'models/expense_distilbert_onnx/model_int8.onnx')
+
+    categorizer = OnnxCategorizer(model_path=model_path)
+    batcher = MicroBatcher(
+        categorizer.predict_batch,
+        max_batch=int(os.environ.get('CATEGORIZE_MAX_BATCH', 32)),
+        max_wait=float(os.environ.get('CATEGORIZE_MAX_WAIT_MS', 5)) / 1000.0
+    )
+
+    server = ModelServer(socket_path, categorizer, batcher)
+    # Let gunicorn's on_exit terminate() unwind through the cleanup below
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    logger.info(f"Model server listening on {socket_path}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Buffered CSV log of user category corrections
+Keeps one long-lived writer per process and flushes it periodically
+"""
+
+import os
+import csv
+import atexit
+import threading
+import logging
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+
+class CorrectionLog:
+    """
+    Append-only corrections CSV shared by all request threads of a process.
+    Rows are buffered in memory and flushed at most every ``flush_interval``
+    seconds, and on interpreter exit.
+    """
+
+    def __init__(self, path: str = 'data/corrections.csv', flush_interval: float = 2.0, buffer_size: int = 1 << 16):
+        """
+        Args:
+            path: CSV file to append corrections to
+            flush_interval: Maximum seconds a written row stays buffered
+            buffer_size: Size of the file write buffer in bytes
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._writer = None
+        self._pid = None
+        self._flush_timer = None
+
+        atexit.register(self.close)
+
+    def _ensure_open(self):
+        # Open lazily in each process: a handle or timer created in the
+        # gunicorn master before fork must not be shared by the workers
+        if self._pid != os.getpid():
+            self._file = open(self.path, 'a', newline='', encoding='utf-8', buffering=self.buffer_size)
+            self._writer = csv.writer(self._file)
+            self._flush_timer = None
+            self._pid = os.getpid()
+
+    def append(self, row: List) -> None:
+        """Buffer a correction row; it is written to disk by the next flush"""
+        with self._lock:
+            self._ensure_open()
+            self._writer.writerow(row)
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self) -> None:
+        """Write buffered rows to disk"""
+        with self._lock:
+            self._flush_timer = None
+            if self._file is not None and self._pid == os.getpid():
+                try:
+                    self._file.flush()
+                except Exception as e:
+                    logger.error(f"Error flushing corrections log: {str(e)}")
+
+    def close(self) -> None:
+        """Flush and close the log"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if self._file is not None and self._pid == os.getpid():
+                self._file.close()
+            self._file = None
+            self._writer = None
+            self._pid = None
@@ -5,7 +5,9 @@ Handles saving and retrieving expense data with the new user-based collection st
 
 import os
 import json
+import atexit
 import logging
+import threading
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
 from decimal import Decimal
@@ -36,6 +38,12 @@ class FirestoreService:
         """
         self.db = None
         self.app = None
+        self._bulk_writer = None
+        self._bulk_writer_pid = None
+        self._bulk_writer_lock = threading.Lock()
+        self._bulk_flush_timer = None
+        # Maximum seconds a queued write waits for the BulkWriter to fill a batch
+        self.bulk_flush_interval = 2.0
         
         if not firebase_admin:
             logger.error("Firebase Admin SDK not installed. Run: pip install firebase-admin")
@@ -430,6 +438,79 @@ class FirestoreService:
             logger.error(f"Error creating/updating user profile: {str(e)}")
             return False
     
+    def _get_bulk_writer(self):
+        """Lazily create this process's BulkWriter (its sender threads don't survive fork)"""
+        with self._bulk_writer_lock:
+            if self._bulk_writer is None or self._bulk_writer_pid != os.getpid():
+                self._bulk_writer = self.db.bulk_writer()
+                self._bulk_writer_pid = os.getpid()
+                self._bulk_flush_timer = None
+                atexit.register(self.flush_writes)
+            return self._bulk_writer
+    
+    def _schedule_bulk_flush(self):
+        """
+        Send queued writes within bulk_flush_interval seconds; the BulkWriter
+        itself only sends once a full batch of 20 has been queued
+        """
+        with self._bulk_writer_lock:
+            if self._bulk_flush_timer is None and self._bulk_writer_pid == os.getpid():
+                self._bulk_flush_timer = threading.Timer(self.bulk_flush_interval, self._flush_pending_writes)
+                self._bulk_flush_timer.daemon = True
+                self._bulk_flush_timer.start()
+    
+    def _flush_pending_writes(self):
+        """Send the queued writes, keeping the bulk writer open for more"""
+        with self._bulk_writer_lock:
+            self._bulk_flush_timer = None
+            bulk_writer = self._bulk_writer if self._bulk_writer_pid == os.getpid() else None
+        if bulk_writer is not None:
+            try:
+                bulk_writer.flush()
+            except Exception as e:
+                logger.error(f"Error flushing queued writes: {str(e)}")
+    
+    def queue_correction(self, correction_data: Dict[str, Any]) -> bool:
+        """
+        Queue a category correction for a batched background write to the
+        corrections collection
+        
+        Args:
+            correction_data: Correction fields (description, correct_category, ...)
+            
+        Returns:
+            True if the write was queued, False otherwise
+        """
+        if not self.db:
+            return False
+        
+        try:
+            correction_doc = dict(correction_data)
+            correction_doc['created_at'] = datetime.now().isoformat()
+            
+            correction_ref = self.db.collection('corrections').document(self._generate_id())
+            self._get_bulk_writer().create(correction_ref, correction_doc)
+            self._schedule_bulk_flush()
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error queueing correction: {str(e)}")
+            return False
+    
+    def flush_writes(self):
+        """Send all queued writes and stop the bulk writer"""
+        with self._bulk_writer_lock:
+            if self._bulk_flush_timer is not None:
+                self._bulk_flush_timer.cancel()
+                self._bulk_flush_timer = None
+            if self._bulk_writer is not None and self._bulk_writer_pid == os.getpid():
+                try:
+                    self._bulk_writer.close()
+                except Exception as e:
+                    logger.error(f"Error flushing queued writes: {str(e)}")
+            self._bulk_writer = None
+            self._bulk_writer_pid = None
+    
     def _generate_id(self) -> str:
         """Generate a unique ID"""
         import uuid
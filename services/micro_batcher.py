@@ -0,0 +1,98 @@
+"""
+Micro-batching queue for categorization requests
+Coalesces concurrent single predictions into one predict_batch call
+"""
+
+import os
+import queue
+import threading
+import time
+import logging
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Collects single (description, amount) predictions from request threads and
+    dispatches them to the categorizer as one padded batch, waiting at most
+    ``max_wait`` seconds for the batch to fill up to ``max_batch`` items.
+    Merchant names are passed on only for batches that carry one, so
+    categorizers without a ``merchant_names`` argument keep working.
+    """
+
+    def __init__(self, predict_batch: Callable[..., List[Dict]],
+                 max_batch: int = 32, max_wait: float = 0.005, timeout: float = 30.0):
+        """
+        Args:
+            predict_batch: Categorizer batch prediction method
+            max_batch: Maximum number of items per dispatched batch
+            max_wait: Maximum seconds to wait for a batch to fill
+            timeout: Maximum seconds a caller waits for its result
+        """
+        self.predict_batch = predict_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._queue = None
+        self._pid = None
+
+    def _ensure_worker(self):
+        # Threads don't survive fork (gunicorn --preload), so each process
+        # starts its own queue and worker on first use
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            worker = threading.Thread(target=self._run, args=(self._queue,), name='categorize-batcher', daemon=True)
+            worker.start()
+            self._pid = os.getpid()
+
+    def predict(self, description: str, amount: Optional[float] = None, merchant_name: str = '') -> Dict:
+        """Queue a single prediction and block until its batch has been scored"""
+        self._ensure_worker()
+
+        done = threading.Event()
+        slot = {}
+        self._queue.put((description, amount, merchant_name, done, slot))
+
+        if not done.wait(self.timeout):
+            raise TimeoutError('Categorization timed out')
+        if 'error' in slot:
+            raise slot['error']
+        return slot['result']
+
+    def _run(self, pending: queue.Queue):
+        while True:
+            batch = [pending.get()]
+            deadline = time.monotonic() + self.max_wait
+            try:
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    batch.append(pending.get(timeout=remaining))
+            except queue.Empty:
+                pass
+
+            try:
+                descriptions = [item[0] for item in batch]
+                amounts = [item[1] for item in batch]
+                merchant_names = [item[2] for item in batch]
+                if any(merchant_names):
+                    results = self.predict_batch(descriptions, amounts, merchant_names=merchant_names)
+                else:
+                    results = self.predict_batch(descriptions, amounts)
+                for (_, _, _, done, slot), result in zip(batch, results):
+                    slot['result'] = result
+                    done.set()
+            except Exception as e:
+                logger.error(f"Batch categorization failed: {str(e)}")
+                for _, _, _, done, slot in batch:
+                    slot['error'] = e
+                    done.set()
@@ -8,10 +8,10 @@ import base64
 import json
 import logging
 import re
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Union, BinaryIO
 from datetime import datetime, timedelta
 import requests
-from PIL import Image
+from PIL import Image, ImageOps
 import io
 import time
 import random
@@ -30,6 +30,9 @@ class GeminiReceiptExtractor:
     Extracts structured expense data from receipt/bill images
     """
     
+    # Longest edge sent to Gemini (its recommended maximum)
+    MAX_IMAGE_EDGE = 1568
+    
     def __init__(self, api_key: str = None):
         """
         Initialize the Gemini Receipt Extractor
@@ -96,40 +99,47 @@ class GeminiReceiptExtractor:
             'phone': 'Bills & Utilities',
         }
         
-    def _prepare_image(self, image_data: bytes) -> str:
+    def _prepare_image(self, image_data: bytes, image_format: str = 'jpeg') -> tuple:
         """
-        Prepare image for Gemini API by converting to base64
+        Prepare image for Gemini API: decode once, auto-orient, downscale and
+        re-encode as JPEG
         
         Args:
             image_data: Raw image bytes
+            image_format: Format of the uploaded image (used if re-encoding fails)
             
         Returns:
-            Base64 encoded image string
+            Tuple of (base64 encoded image string, mime type)
         """
         try:
-            # Optimize image if too large
             image = Image.open(io.BytesIO(image_data))
             
-            # Resize if image is too large (max 4MB for Gemini)
-            max_size = (2048, 2048)
+            # Let the JPEG decoder scale down by a power of two while decoding
+            max_size = (self.MAX_IMAGE_EDGE, self.MAX_IMAGE_EDGE)
+            image.draft('RGB', max_size)
+            
+            # Phone photos are often stored sideways with an EXIF orientation tag
+            image = ImageOps.exif_transpose(image)
+            
+            # Gemini downsamples anything larger anyway
             if image.size[0] > max_size[0] or image.size[1] > max_size[1]:
                 image.thumbnail(max_size, Image.Resampling.LANCZOS)
                 
-            # Convert to RGB if necessary
-            if image.mode in ('RGBA', 'P'):
+            # JPEG only holds RGB / grayscale
+            if image.mode not in ('RGB', 'L'):
                 image = image.convert('RGB')
                 
             # Save optimized image to bytes
             img_buffer = io.BytesIO()
-            image.save(img_buffer, format='JPEG', quality=85, optimize=True)
+            image.save(img_buffer, format='JPEG', quality=85)
             optimized_image_data = img_buffer.getvalue()
             
-            return base64.b64encode(optimized_image_data).decode('utf-8')
+            return base64.b64encode(optimized_image_data).decode('utf-8'), 'image/jpeg'
             
         except Exception as e:
             logger.error(f"Error preparing image: {str(e)}")
             # Fallback to original image
-            return base64.b64encode(image_data).decode('utf-8')
+            return base64.b64encode(image_data).decode('utf-8'), f"image/{image_format}"
     
     def _create_extraction_prompt(self) -> str:
         """
@@ -323,12 +333,12 @@ Analyze the image thoroughly and provide accurate, structured data.
                 time.sleep(delay)
                 return self._make_api_request_with_retry(payload, retry_count + 1)
             return None
-    def extract_receipt_data(self, image_data: bytes, image_format: str = 'jpeg') -> Dict[str, Any]:
+    def extract_receipt_data(self, image_data: Union[bytes, BinaryIO], image_format: str = 'jpeg') -> Dict[str, Any]:
         """
         Extract structured expense data from receipt image using Gemini AI with retry logic
         
         Args:
-            image_data: Raw image bytes
+            image_data: Raw image bytes or a binary file-like object (e.g. an upload stream)
             image_format: Image format (jpeg, png, etc.)
             
         Returns:
@@ -337,8 +347,12 @@ Analyze the image thoroughly and provide accurate, structured data.
         try:
             logger.info("Starting receipt extraction with Gemini AI (with quota handling)...")
             
+            # Read file-like input exactly once
+            if hasattr(image_data, 'read'):
+                image_data = image_data.read()
+            
             # Prepare image for API
-            base64_image = self._prepare_image(image_data)
+            base64_image, mime_type = self._prepare_image(image_data, image_format)
             
             # Create API request payload with optimized settings for quota management
             payload = {
@@ -350,7 +364,7 @@ Analyze the image thoroughly and provide accurate, structured data.
                             },
                             {
                                 "inline_data": {
-                                    "mime_type": f"image/{image_format}",
+                                    "mime_type": mime_type,
                                     "data": base64_image
                                 }
                             }
@@ -0,0 +1,45 @@
+"""
+Request body schemas for the Finze API
+Decoded and validated in one pass with msgspec
+"""
+
+from typing import Any, Dict, List, Optional
+
+import msgspec
+
+
+class CategorizeRequest(msgspec.Struct):
+    """Body of /api/categorize and one item of /api/categorize-batch"""
+    description: Optional[str] = None
+    merchant_name: Optional[str] = None
+    amount: Optional[float] = None
+
+
+class CategorizeBatchRequest(msgspec.Struct):
+    """Body of /api/categorize-batch"""
+    items: List[CategorizeRequest] = []
+
+
+class CorrectionRequest(msgspec.Struct):
+    """Body of /api/correction; string fields may be null, handlers treat that as empty"""
+    description: Optional[str] = None
+    correct_category: Optional[str] = None
+    merchant_name: Optional[str] = None
+    amount: Optional[float] = None
+
+
+class SaveExpenseRequest(msgspec.Struct):
+    """Envelope of /api/save-expense; without expense_data the whole body is the expense"""
+    user_id: Optional[str] = None
+    expense_data: Optional[Dict[str, Any]] = None
+
+
+def decode_request(body: bytes, schema):
+    """
+    Decode a JSON request body into ``schema``.
+    Non-strict mode lets numeric strings such as "12.50" fill float fields.
+
+    Raises:
+        msgspec.DecodeError: Malformed JSON or a body that doesn't fit the schema
+    """
+    return msgspec.json.decode(body, type=schema, strict=False)